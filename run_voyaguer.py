@@ -1,6 +1,8 @@
 from voyager import Voyager
+from voyager.env import get_mineflayer_process
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 import signal
 import sys
 import logging
@@ -13,11 +15,14 @@ logging.basicConfig(
 )
 
 class MultiAgentManager:
-    def __init__(self, mc_port, openai_api_key, num_agents=2, base_server_port=3000):
+    def __init__(self, mc_port, openai_api_key, num_agents=2, base_server_port=3000, shared_server=True, headless=False):
         self.mc_port = mc_port
         self.openai_api_key = openai_api_key
         self.num_agents = num_agents
         self.base_server_port = base_server_port
+        self.shared_server = shared_server
+        # skip the per bot viewers, env.attach_viewer() starts one when needed
+        self.headless = headless
         self.agents = []
         self.threads = []
         self.logger = logging.getLogger('MultiAgentManager')
@@ -29,6 +34,11 @@ class MultiAgentManager:
         # Create necessary directories
         self.create_directories()
 
+        # One mineflayer server hosting every bot instead of one per agent
+        self.mineflayer = None
+        if self.shared_server:
+            self.mineflayer = get_mineflayer_process(base_server_port, "mineflayer_shared")
+
     def create_directories(self):
         # Create base directories
         base_dirs = ["logs", "ckpt"]
@@ -53,12 +63,16 @@ class MultiAgentManager:
                     f.write('{}')
 
     def create_agent(self, index):
-        server_port = self.base_server_port + index
+        server_port = self.base_server_port
+        if not self.shared_server:
+            server_port += index
         try:
             agent = Voyager(
                 mc_port=self.mc_port,
                 openai_api_key=self.openai_api_key,
                 server_port=server_port,
+                env_mineflayer=self.mineflayer,
+                env_headless=self.headless,
                 bot_username=self.bot_names[index],
                 resume=True,  # Changed to False for first run
                 env_wait_ticks=20,
@@ -83,8 +97,8 @@ class MultiAgentManager:
                         break
                 except Exception as e:
                     self.logger.error(f"Error in agent {agent.env.bot_username}: {str(e)}")
-                    if not self.shutdown_event.is_set():
-                        time.sleep(5)
+                    # back off before retrying, unless shutting down
+                    self.shutdown_event.wait(5)
         finally:
             try:
                 agent.close()
@@ -93,17 +107,19 @@ class MultiAgentManager:
                 self.logger.error(f"Error closing agent {agent.env.bot_username}: {str(e)}")
 
     def start(self):
-        # Create and start agents
-        for i in range(self.num_agents):
+        start_time = time.time()
+        # Create agents in parallel, each starts its mineflayer (or the shared
+        # one) and loads its vector stores while the others do the same
+        with ThreadPoolExecutor(max_workers=self.num_agents) as executor:
+            futures = [executor.submit(self.create_agent, i) for i in range(self.num_agents)]
+        for i, future in enumerate(futures):
             try:
-                agent = self.create_agent(i)
-                self.agents.append(agent)
-                time.sleep(5)  # Wait between agent creation
+                self.agents.append(future.result())
             except Exception as e:
                 self.logger.error(f"Error creating agent {i + 1}: {str(e)}")
-                continue
 
-        # Create and start threads
+        # Start the agents one after the other, each once the previous bot
+        # has spawned instead of after a fixed delay
         for agent in self.agents:
             thread = threading.Thread(
                 target=self.run_agent,
@@ -112,8 +128,15 @@ class MultiAgentManager:
             )
             self.threads.append(thread)
             thread.start()
-            time.sleep(5)  # Wait between thread starts
             self.logger.info(f"Started thread for {agent.env.bot_username}")
+            deadline = time.time() + agent.env.request_timeout
+            while not agent.env.ready.wait(0.5):
+                if self.shutdown_event.is_set() or not thread.is_alive():
+                    break
+                if time.time() > deadline:
+                    self.logger.warning(f"{agent.env.bot_username} is not ready yet, starting the next agent")
+                    break
+        self.logger.info(f"Agents ready in {time.time() - start_time:.1f}s")
 
     def stop(self):
         self.logger.info("Shutting down all agents...")
@@ -135,6 +158,9 @@ class MultiAgentManager:
             except Exception as e:
                 self.logger.error(f"Error joining thread {thread.name}: {str(e)}")
 
+        if self.mineflayer:
+            self.mineflayer.stop()
+
         self.logger.info("All agents shut down")
 
     def signal_handler(self, signum, frame):
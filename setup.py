@@ -6,7 +6,10 @@ from setuptools import setup, find_packages
 
 PKG_NAME = "voyager"
 VERSION = "0.1"
-EXTRAS = {}
+EXTRAS = {
+    "msgpack": ["msgpack"],
+    "async": ["aiohttp"],
+}
 
 
 def _read_file(fname):
@@ -0,0 +1,171 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("gymnasium")
+web = pytest.importorskip("aiohttp.web")
+
+from voyager.env.async_bridge import AsyncVoyagerEnv
+from voyager.env.bridge import VoyagerEnv
+
+OBSERVE = ["observe", {"inventory": {}}]
+PROGRAM = "async function mineBlock(bot, name, count) {}"
+
+
+class FakeMineflayer:
+    is_running = True
+
+    def run(self):
+        self.is_running = True
+
+    def stop(self):
+        self.is_running = False
+
+
+class FakeServer:
+    """
+    A mineflayer server answering /step with the scripted status codes.
+    """
+
+    def __init__(self, step_statuses=()):
+        self.step_statuses = list(step_statuses)
+        self.requests = []
+        self.programs = set()
+        self.app = web.Application()
+        for path in ["/start", "/reset", "/pause", "/stop", "/cancel"]:
+            self.app.router.add_post(path, self.reply)
+        self.app.router.add_post("/step", self.step)
+
+    async def reply(self, request):
+        self.requests.append((request.path, await request.json()))
+        return web.json_response([OBSERVE])
+
+    async def step(self, request):
+        data = await request.json()
+        self.requests.append((request.path, data))
+        if self.step_statuses:
+            status = self.step_statuses.pop(0)
+            if status != 200:
+                return web.json_response({"error": "scripted"}, status=status)
+        self.programs.update(data.get("newPrograms", []))
+        events = [["onChat", {"onChat": "hi"}], OBSERVE]
+        if not data.get("stream"):
+            return web.json_response(events)
+        response = web.StreamResponse()
+        response.content_type = "application/x-ndjson"
+        await response.prepare(request)
+        for event in events:
+            await response.write((json.dumps(event) + "\n").encode())
+        await response.write_eof()
+        return response
+
+    def paths(self):
+        return [path for path, _ in self.requests]
+
+
+def run(server, test):
+    async def main():
+        runner = web.AppRunner(server.app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        env = AsyncVoyagerEnv(
+            mc_port=25565,
+            server_port=port,
+            mineflayer=FakeMineflayer(),
+        )
+        try:
+            await env.reset()
+            await test(env)
+        finally:
+            await env.close()
+            await runner.cleanup()
+
+    asyncio.run(main())
+
+
+def test_wraps_instead_of_subclassing():
+    env = AsyncVoyagerEnv(mc_port=25565, mineflayer=FakeMineflayer())
+    assert not isinstance(env, VoyagerEnv)
+    assert isinstance(env.env, VoyagerEnv)
+    assert env.bot_username == "bot"
+    env.env.session.close()
+
+
+def test_step_uploads_programs_once():
+    server = FakeServer()
+
+    async def test(env):
+        events = await env.step("await mineBlock(bot);", [PROGRAM])
+        assert events[-1] == OBSERVE
+        events = await env.step("await mineBlock(bot);", [PROGRAM])
+        first, second = [data for path, data in server.requests if path == "/step"]
+        assert first["newPrograms"] == [PROGRAM]
+        assert second["newPrograms"] == []
+        assert second["programHashes"] == first["programHashes"]
+        assert env.has_reset and env.connected
+
+    run(server, test)
+    assert server.paths() == ["/start", "/step", "/step", "/stop"]
+
+
+def test_step_starts_a_lost_bot_again():
+    server = FakeServer(step_statuses=[404])
+
+    async def test(env):
+        events = await env.step("bot.chat('hi');")
+        assert events[-1] == OBSERVE
+
+    run(server, test)
+    assert server.paths() == ["/start", "/step", "/start", "/step", "/stop"]
+
+
+def test_step_uploads_all_programs_to_a_restarted_server():
+    server = FakeServer()
+
+    async def test(env):
+        await env.step("await mineBlock(bot);", [PROGRAM])
+        # mineflayer restarted and lost its registry
+        server.programs.clear()
+        server.step_statuses = [409]
+        await env.step("await mineBlock(bot);", [PROGRAM])
+
+    run(server, test)
+    steps = [data for path, data in server.requests if path == "/step"]
+    assert [data["newPrograms"] for data in steps] == [[PROGRAM], [], [PROGRAM]]
+    assert server.programs == {PROGRAM}
+
+
+def test_failed_step_raises():
+    server = FakeServer(step_statuses=[500])
+
+    async def test(env):
+        with pytest.raises(RuntimeError):
+            await env.step("bot.chat('hi');")
+
+    run(server, test)
+
+
+def test_stream_step_yields_events_as_they_arrive():
+    server = FakeServer()
+
+    async def test(env):
+        events = [event async for event in env.stream_step("bot.chat('hi');")]
+        assert events == [["onChat", {"onChat": "hi"}], OBSERVE]
+
+    run(server, test)
+    assert server.requests[1][1]["stream"] is True
+
+
+def test_reset_is_soft_after_the_first_one():
+    server = FakeServer()
+
+    async def test(env):
+        await env.reset(options={"mode": "soft"})
+        assert env.reset_options["reset"] == "soft"
+
+    run(server, test)
+    assert server.paths() == ["/start", "/reset", "/stop"]
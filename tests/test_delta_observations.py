@@ -0,0 +1,68 @@
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("gymnasium")
+
+from voyager.env.bridge import VoyagerEnv, apply_delta
+
+
+def test_same_keeps_previous():
+    previous = {"oak_log": 2}
+    assert apply_delta(previous, {"$same": True}) is previous
+
+
+def test_set_and_delete_keys():
+    previous = {"oak_log": 2, "stick": 1}
+    value = {"$set": {"oak_log": 1, "oak_planks": 4}, "$del": ["stick"]}
+    assert apply_delta(previous, value) == {"oak_log": 1, "oak_planks": 4}
+    assert previous == {"oak_log": 2, "stick": 1}
+
+
+def test_add_and_remove_items():
+    previous = ["grass_block", "dirt"]
+    value = {"$add": ["stone"], "$del": ["grass_block"]}
+    assert apply_delta(previous, value) == ["dirt", "stone"]
+    assert previous == ["grass_block", "dirt"]
+
+
+def test_full_values_replace_previous():
+    assert apply_delta({"oak_log": 2}, {"stick": 4}) == {"stick": 4}
+    assert apply_delta(["dirt"], ["stone", "stone"]) == ["stone", "stone"]
+    assert apply_delta({"health": 20}, None) is None
+
+
+def rebuild(env, observation):
+    return env.rebuild_event(["observe", observation])[1]
+
+
+def test_rebuild_event_round_trip():
+    # rebuild_event only touches the held observation
+    env = VoyagerEnv.__new__(VoyagerEnv)
+    env.observation = {}
+    env.observation_seq = None
+    first = rebuild(
+        env,
+        {"deltaSeq": 1, "inventory": {"oak_log": 2}, "voxels": ["dirt"]},
+    )
+    assert first == {"inventory": {"oak_log": 2}, "voxels": ["dirt"]}
+    assert env.observation_seq == 1
+    second = rebuild(
+        env,
+        {
+            "deltaSeq": 2,
+            "deltaBase": 1,
+            "inventory": {"$set": {"stick": 4}, "$del": ["oak_log"]},
+            "voxels": {"$same": True},
+        },
+    )
+    assert second == {"inventory": {"stick": 4}, "voxels": ["dirt"]}
+    # a full observation drops what was held before
+    third = rebuild(env, {"deltaSeq": 3, "voxels": ["stone"]})
+    assert third == {"voxels": ["stone"]}
+    assert env.observation == {"voxels": ["stone"]}
+
+
+def test_events_without_sequence_are_left_alone():
+    env = VoyagerEnv.__new__(VoyagerEnv)
+    event = ["onChat", {"onChat": "hi"}]
+    assert env.rebuild_event(event) is event
@@ -0,0 +1,142 @@
+import pytest
+
+pytest.importorskip("langchain")
+
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
+
+from voyager.agents.critic import CriticAgent
+from voyager.agents.llm_cache import LLMCache, LLMCacheMiss, discard_response
+
+
+class FakeChatModel:
+    def __init__(self, model_name="gpt-4", temperature=0):
+        self.model_name = model_name
+        self.temperature = temperature
+        self.request_timeout = 120
+        self.calls = 0
+
+    def __call__(self, messages):
+        self.calls += 1
+        return AIMessage(content=f"response {self.calls}")
+
+
+MESSAGES = [SystemMessage(content="system"), HumanMessage(content="task")]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache" / "llm.sqlite")
+
+
+def test_read_write_asks_once(path):
+    llm = FakeChatModel()
+    cache = LLMCache(path)
+    model = cache.wrap(llm, "action")
+    assert model(MESSAGES).content == "response 1"
+    assert model(MESSAGES).content == "response 1"
+    assert llm.calls == 1
+    assert cache.hit_rates() == {"action": 0.5}
+    cache.close()
+
+
+def test_key_covers_model_temperature_and_messages(path):
+    cache = LLMCache(path)
+    key = cache.key("gpt-4", 0, MESSAGES)
+    assert key != cache.key("gpt-3.5-turbo", 0, MESSAGES)
+    assert key != cache.key("gpt-4", 0.5, MESSAGES)
+    assert key != cache.key("gpt-4", 0, MESSAGES[:1])
+    assert key == cache.key("gpt-4", 0, list(MESSAGES))
+    cache.close()
+
+
+def test_record_always_asks(path):
+    llm = FakeChatModel()
+    cache = LLMCache(path, mode="record")
+    model = cache.wrap(llm, "critic")
+    model(MESSAGES)
+    assert model(MESSAGES).content == "response 2"
+    assert llm.calls == 2
+    cache.close()
+    # the newest recording is replayed
+    replay = LLMCache(path, mode="replay")
+    assert replay.wrap(FakeChatModel(), "critic")(MESSAGES).content == "response 2"
+    replay.close()
+
+
+def test_replay_never_asks(path):
+    cache = LLMCache(path)
+    cache.wrap(FakeChatModel(), "curriculum")(MESSAGES)
+    cache.close()
+    llm = FakeChatModel()
+    replay = LLMCache(path, mode="replay")
+    model = replay.wrap(llm, "curriculum")
+    assert model(MESSAGES).content == "response 1"
+    with pytest.raises(LLMCacheMiss):
+        model([HumanMessage(content="another task")])
+    assert llm.calls == 0
+    replay.close()
+
+
+def test_unknown_mode(path):
+    with pytest.raises(ValueError):
+        LLMCache(path, mode="write")
+
+
+def test_evicts_least_recently_used(path):
+    cache = LLMCache(path, max_bytes=20)
+    cache.put("a", "gpt-4", 0, "x" * 8)
+    cache.put("b", "gpt-4", 0, "y" * 8)
+    assert cache.get("a") == "x" * 8
+    cache.put("c", "gpt-4", 0, "z" * 8)
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 8
+    assert cache.get("c") == "z" * 8
+    cache.close()
+
+
+def test_wrapped_model_attributes(path):
+    llm = FakeChatModel()
+    cache = LLMCache(path)
+    model = cache.wrap(llm, "skill")
+    assert model.request_timeout == 120
+    assert model.model_name == "gpt-4"
+    cache.close()
+
+
+class ScriptedChatModel(FakeChatModel):
+    def __init__(self, replies):
+        super().__init__()
+        self.replies = list(replies)
+
+    def __call__(self, messages):
+        self.calls += 1
+        return AIMessage(content=self.replies.pop(0))
+
+
+def test_discarded_response_is_asked_again(path):
+    cache = LLMCache(path)
+    cache.wrap(ScriptedChatModel(["not json"]), "critic")(MESSAGES)
+    llm = ScriptedChatModel(['{"success": true, "critique": ""}'])
+    critic = CriticAgent.__new__(CriticAgent)
+    critic.llm = cache.wrap(llm, "critic")
+    # the cached bad response is used once, the retry reaches the model
+    assert critic.ai_check_task_success(MESSAGES) == (True, "")
+    assert llm.calls == 1
+    assert critic.ai_check_task_success(MESSAGES) == (True, "")
+    assert llm.calls == 1
+    cache.close()
+
+
+def test_replay_keeps_discarded_responses(path):
+    cache = LLMCache(path)
+    cache.wrap(ScriptedChatModel(["not json"]), "critic")(MESSAGES)
+    cache.close()
+    replay = LLMCache(path, mode="replay")
+    model = replay.wrap(FakeChatModel(), "critic")
+    discard_response(model, MESSAGES)
+    assert model(MESSAGES).content == "not json"
+    replay.close()
+
+
+def test_discard_ignores_uncached_models():
+    discard_response(FakeChatModel(), MESSAGES)
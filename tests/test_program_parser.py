@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from voyager.agents import program_parser
+from voyager.agents.program_parser import ProgramParseError, parse_program
+
+
+class FakeParser:
+    """
+    Stands in for the babel module in the node process.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def extract(self, code):
+        self.calls.append(code)
+        if "syntax error" in code:
+            return json.dumps({"error": "Unexpected token (1:7)"})
+        return json.dumps(
+            {
+                "statements": 1,
+                "functions": [
+                    {"name": "f", "async": True, "params": ["bot"], "body": code}
+                ],
+            }
+        )
+
+
+@pytest.fixture
+def parser(monkeypatch):
+    fake = FakeParser()
+    monkeypatch.setattr(program_parser, "_parser", fake)
+    program_parser._extract.cache_clear()
+    yield fake
+    program_parser._extract.cache_clear()
+
+
+def test_parses_through_the_loaded_parser(parser):
+    parsed = parse_program("async function f(bot) {}")
+    assert parsed["statements"] == 1
+    assert parsed["functions"][0]["name"] == "f"
+    assert parsed["functions"][0]["params"] == ["bot"]
+
+
+def test_memoizes_by_code(parser):
+    parse_program("async function f(bot) {}")
+    parse_program("async function f(bot) {}")
+    parse_program("async function g(bot) {}")
+    assert parser.calls == ["async function f(bot) {}", "async function g(bot) {}"]
+
+
+def test_results_are_not_shared(parser):
+    parse_program("async function f(bot) {}")["functions"].clear()
+    assert parse_program("async function f(bot) {}")["functions"]
+
+
+def test_parse_errors_raise_and_are_memoized(parser):
+    for _ in range(2):
+        with pytest.raises(ProgramParseError, match="Unexpected token"):
+            parse_program("syntax error")
+    assert parser.calls == ["syntax error"]
+
+
+def test_parse_error_is_a_value_error():
+    assert issubclass(ProgramParseError, ValueError)
@@ -0,0 +1,159 @@
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("langchain")
+
+from langchain.schema import AIMessage
+
+from voyager.agents.curriculum import CurriculumAgent
+
+# questions with the same first coordinate are near duplicates
+EMBEDDINGS = {
+    "What are the blocks in the plains?": [1.0, 0.0],
+    "What blocks are in the plains?": [1.0, 0.1],
+    "What are the mobs in the plains?": [2.0, 0.0],
+    "What are the items in the plains?": [3.0, 0.0],
+    "How to craft a stick?": [4.0, 0.0],
+}
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [EMBEDDINGS[text] for text in texts]
+
+
+class FakeCollection:
+    """
+    Nearest neighbour lookup by squared L2 distance like chroma's default.
+    """
+
+    def __init__(self):
+        self.documents = []
+        self.embeddings = []
+        self.queries = 0
+
+    def count(self):
+        return len(self.documents)
+
+    def query(self, query_embeddings, n_results, include):
+        self.queries += 1
+        result = {"documents": [], "distances": []}
+        for query in query_embeddings:
+            distances = [
+                sum((x - y) ** 2 for x, y in zip(query, embedding))
+                for embedding in self.embeddings
+            ]
+            nearest = min(range(len(distances)), key=distances.__getitem__)
+            result["documents"].append([self.documents[nearest]])
+            result["distances"].append([distances[nearest]])
+        return result
+
+    def add(self, ids, embeddings, documents):
+        assert len(set(ids)) == len(ids)
+        self.embeddings.extend(embeddings)
+        self.documents.extend(documents)
+
+
+class FakeVectorDB:
+    def __init__(self):
+        self._embedding_function = FakeEmbeddings()
+        self._collection = FakeCollection()
+        self.persists = 0
+
+    def persist(self):
+        self.persists += 1
+
+
+class FakeChatModel:
+    def __init__(self):
+        self.questions = []
+        self.lock = threading.Lock()
+
+    def __call__(self, messages):
+        question = messages[-1].content[len("Question: ") :]
+        with self.lock:
+            self.questions.append(question)
+        return AIMessage(content=f"Answer: {question}")
+
+
+@pytest.fixture
+def agent(tmp_path):
+    (tmp_path / "curriculum").mkdir()
+    curriculum = CurriculumAgent.__new__(CurriculumAgent)
+    curriculum.ckpt_dir = str(tmp_path)
+    curriculum.qa_cache = {}
+    curriculum.qa_cache_questions_vectordb = FakeVectorDB()
+    curriculum.qa_llm = FakeChatModel()
+    curriculum.qa_workers = 2
+    return curriculum
+
+
+def run_qa(agent, questions):
+    agent.run_qa_step1_ask_questions = lambda **kwargs: (questions, questions)
+    return agent.run_qa(events=[], chest_observation="")
+
+
+def test_answers_misses_and_persists_once(agent, tmp_path):
+    questions = ["What are the mobs in the plains?", "How to craft a stick?"]
+    asked, answers = run_qa(agent, questions)
+    assert asked == questions
+    assert answers == [f"Answer: {question}" for question in questions]
+    assert sorted(agent.qa_llm.questions) == sorted(questions)
+    vectordb = agent.qa_cache_questions_vectordb
+    assert vectordb._embedding_function.calls == [questions]
+    assert vectordb._collection.documents == questions
+    assert vectordb.persists == 1
+    with open(tmp_path / "curriculum" / "qa_cache.json") as f:
+        assert json.load(f) == agent.qa_cache
+
+
+def test_close_questions_reuse_cached_answers(agent):
+    run_qa(agent, ["What are the blocks in the plains?"])
+    agent.qa_llm.questions.clear()
+    asked, answers = run_qa(
+        agent, ["What blocks are in the plains?", "What are the mobs in the plains?"]
+    )
+    # one lookup for the whole batch, only the far question is asked
+    assert agent.qa_cache_questions_vectordb._collection.queries == 1
+    assert agent.qa_llm.questions == ["What are the mobs in the plains?"]
+    assert asked == [
+        "What are the blocks in the plains?",
+        "What are the mobs in the plains?",
+    ]
+    assert answers[0] == "Answer: What are the blocks in the plains?"
+
+
+def test_near_duplicate_misses_are_answered_once(agent):
+    questions = [
+        "What are the blocks in the plains?",
+        "What blocks are in the plains?",
+        "What are the blocks in the plains?",
+        "What are the items in the plains?",
+    ]
+    asked, answers = run_qa(agent, questions)
+    assert sorted(agent.qa_llm.questions) == [
+        "What are the blocks in the plains?",
+        "What are the items in the plains?",
+    ]
+    assert agent.qa_cache_questions_vectordb._collection.documents == [
+        "What are the blocks in the plains?",
+        "What are the items in the plains?",
+    ]
+    assert asked[:3] == ["What are the blocks in the plains?"] * 3
+    assert answers[:3] == ["Answer: What are the blocks in the plains?"] * 3
+
+
+def test_cached_batches_ask_nothing(agent):
+    questions = ["What are the mobs in the plains?", "How to craft a stick?"]
+    run_qa(agent, questions)
+    agent.qa_llm.questions.clear()
+    asked, _ = run_qa(agent, questions)
+    assert asked == questions
+    assert agent.qa_llm.questions == []
+    assert agent.qa_cache_questions_vectordb.persists == 1
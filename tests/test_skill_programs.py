@@ -0,0 +1,150 @@
+import pytest
+
+pytest.importorskip("langchain")
+
+from voyager.agents.skill import SkillManager
+
+
+def manager(skills, primitives):
+    # get_programs only reads the library, no model or vectordb is needed
+    skill_manager = SkillManager.__new__(SkillManager)
+    skill_manager.skills = {name: {"code": code} for name, code in skills.items()}
+    skill_manager.call_graph = {
+        name: SkillManager.extract_calls(code) for name, code in skills.items()
+    }
+    skill_manager.control_primitives = primitives
+    skill_manager.primitive_calls = [
+        SkillManager.extract_calls(primitive) for primitive in primitives
+    ]
+    skill_manager.owners = skill_manager.get_owners()
+    return skill_manager
+
+
+SKILLS = {
+    "craftPlanks": "async function craftPlanks(bot) {\n"
+    "    await mineBlock(bot, 'oak_log', 1);\n"
+    "    await craftItem(bot, 'oak_planks', 1);\n}",
+    "craftTable": "async function craftTable(bot) {\n"
+    "    await craftPlanks(bot);\n"
+    "    await craftItem(bot, 'crafting_table', 1);\n}",
+    "killZombie": "async function killZombie(bot) {\n"
+    "    await killMob(bot, 'zombie', 300);\n}",
+}
+PRIMITIVES = [
+    "async function mineBlock(bot, name, count) {\n"
+    "    _mineBlockFailCount++;\n}",
+    "async function craftItem(bot, name, count) {\n"
+    "    await craftHelper(bot, name);\n}",
+    "async function killMob(bot, name, timeout) {}",
+    "function craftHelper(bot, name) {}",
+]
+
+
+def test_extract_calls_skips_own_declarations():
+    calls = SkillManager.extract_calls(SKILLS["craftTable"])
+    assert "craftPlanks" in calls
+    assert "craftItem" in calls
+    assert "craftTable" not in calls
+
+
+def test_reaches_skills_and_primitives_transitively():
+    programs = manager(SKILLS, PRIMITIVES).get_programs(
+        "await craftTable(bot);"
+    )
+    assert programs == [
+        SKILLS["craftPlanks"],
+        SKILLS["craftTable"],
+        PRIMITIVES[0],
+        PRIMITIVES[1],
+        PRIMITIVES[3],
+    ]
+
+
+def test_unreached_programs_are_left_out():
+    programs = manager(SKILLS, PRIMITIVES).get_programs(
+        "await killZombie(bot);"
+    )
+    assert programs == [SKILLS["killZombie"], PRIMITIVES[2]]
+
+
+def test_code_without_calls_needs_no_programs():
+    assert manager(SKILLS, PRIMITIVES).get_programs("bot.chat('hi');") == []
+
+
+def test_recursive_skills_terminate():
+    skills = {
+        "ping": "async function ping(bot) { await pong(bot); }",
+        "pong": "async function pong(bot) { await ping(bot); }",
+    }
+    programs = manager(skills, []).get_programs("await ping(bot);")
+    assert programs == [skills["ping"], skills["pong"]]
+
+
+class FakeCollection:
+    def __init__(self):
+        self.ids = set()
+
+    def count(self):
+        return len(self.ids)
+
+    def delete(self, ids):
+        self.ids.difference_update(ids)
+
+
+class FakeVectorDB:
+    def __init__(self):
+        self._collection = FakeCollection()
+
+    def add_texts(self, texts, ids, metadatas):
+        self._collection.ids.update(ids)
+
+    def persist(self):
+        pass
+
+
+def test_owners_follow_new_and_rewritten_skills(tmp_path, monkeypatch):
+    skill_manager = manager({}, PRIMITIVES)
+    skill_manager.ckpt_dir = str(tmp_path)
+    (tmp_path / "skill" / "code").mkdir(parents=True)
+    (tmp_path / "skill" / "description").mkdir(parents=True)
+    skill_manager.vectordb = FakeVectorDB()
+    monkeypatch.setattr(
+        skill_manager, "generate_skill_description", lambda name, code: name
+    )
+    builds = []
+    get_owners = skill_manager.get_owners
+    monkeypatch.setattr(
+        skill_manager, "get_owners", lambda: builds.append(1) or get_owners()
+    )
+    assert skill_manager.get_programs("await craftPlanks(bot);") == []
+
+    for name in ["craftPlanks", "craftTable"]:
+        skill_manager.add_new_skill(
+            {"task": name, "program_name": name, "program_code": SKILLS[name]}
+        )
+    assert skill_manager.get_programs("await craftTable(bot);") == [
+        SKILLS["craftPlanks"],
+        SKILLS["craftTable"],
+        PRIMITIVES[0],
+        PRIMITIVES[1],
+        PRIMITIVES[3],
+    ]
+    # get_programs reads the owners built when the library changed
+    assert len(builds) == 2
+
+    # the rewrite declares a helper of its own and no longer mines
+    rewrite = (
+        "async function craftPlanks(bot) {\n"
+        "    await plankHelper(bot);\n}\n"
+        "async function plankHelper(bot) {\n"
+        "    await craftItem(bot, 'oak_planks', 1);\n}"
+    )
+    skill_manager.add_new_skill(
+        {"task": "craftPlanks", "program_name": "craftPlanks", "program_code": rewrite}
+    )
+    assert skill_manager.owners["plankHelper"] == ("skill", "craftPlanks")
+    assert skill_manager.get_programs("await plankHelper(bot);") == [
+        rewrite,
+        PRIMITIVES[1],
+        PRIMITIVES[3],
+    ]
@@ -0,0 +1,87 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("gymnasium")
+
+from voyager.env.bridge import VoyagerEnv, check_health
+
+
+class FakeMineflayer:
+    def __init__(self, pid):
+        self.process = SimpleNamespace(pid=pid)
+        self.is_running = True
+        self.stopped = False
+
+    def run(self):
+        self.is_running = True
+
+    def stop(self):
+        self.is_running = False
+        self.stopped = True
+
+
+class FakePool:
+    def __init__(self, standby):
+        self.standby = standby
+        self.released = []
+
+    def acquire(self):
+        return self.standby
+
+    def release(self, port):
+        self.released.append(port)
+
+
+@pytest.fixture
+def health_server():
+    """
+    A /health endpoint answering with the pid of an old server.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps({"status": "ok", "pid": 1234, "bots": []})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_health_checks_the_process_answering(health_server):
+    assert check_health(health_server)
+    assert check_health(health_server, FakeMineflayer(1234))
+    # the old server still holds the port of a cold started one
+    assert not check_health(health_server, FakeMineflayer(5678))
+    # the new process has not been spawned yet
+    starting = FakeMineflayer(1234)
+    starting.process = None
+    assert not check_health(health_server, starting)
+
+
+def test_minecraft_stops_the_mineflayer_switched_to():
+    old, standby = FakeMineflayer(1), FakeMineflayer(2)
+    env = VoyagerEnv(mc_port=25565, server_port=3000, mineflayer=old)
+    env.pool = FakePool((3100, standby))
+    env.mc_instance = SimpleNamespace(mineflayer=old)
+    env.reset_options = {"server_port": 3000}
+    env.switch_to_standby()
+    assert old.stopped
+    assert env.mineflayer is standby
+    assert env.mc_instance.mineflayer is standby
+    assert env.server == "http://127.0.0.1:3100"
+    assert env.pool.released == [3000]
+    env.session.close()
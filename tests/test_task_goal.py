@@ -0,0 +1,84 @@
+import re
+
+import pytest
+
+pytest.importorskip("langchain")
+
+from voyager.agents.curriculum import CurriculumAgent
+
+
+def goal(task):
+    # get_task_goal only reads module constants
+    return CurriculumAgent.get_task_goal(None, task)
+
+
+def matches(task, item):
+    return re.match(goal(task)["pattern"], item) is not None
+
+
+def test_no_goal_for_free_form_tasks():
+    assert goal("Explore the area") is None
+    assert goal("Place a chest near the house") is None
+
+
+def test_count_and_type():
+    assert goal("Kill 2 zombies")["type"] == "kill"
+    assert goal("Kill 2 zombies")["count"] == 2
+    assert goal("Craft 4 sticks")["type"] == "inventory"
+    assert goal("Craft 4 sticks")["count"] == 4
+
+
+def test_exact_item_names():
+    assert matches("Mine 5 cobblestone", "cobblestone")
+    assert not matches("Mine 5 cobblestone", "mossy_cobblestone")
+    assert matches("Craft 1 wooden pickaxe", "wooden_pickaxe")
+    assert not matches("Craft 1 pickaxe", "wooden_pickaxe")
+    assert matches("Kill 1 pig", "pig")
+    assert not matches("Kill 1 pig", "guinea_pig")
+
+
+def test_plurals():
+    assert matches("Craft 4 sticks", "stick")
+    assert matches("Craft 4 torches", "torch")
+    assert matches("Mine 3 oak leaves", "oak_leaves")
+    assert matches("Kill 2 zombies", "zombie")
+
+
+def test_wood_variants():
+    assert matches("Mine 1 wood log", "oak_log")
+    assert matches("Mine 3 logs", "birch_log")
+    assert matches("Craft 4 planks", "dark_oak_planks")
+    assert not matches("Mine 1 wood log", "stripped_oak_log")
+    assert matches("Mine 1 oak log", "oak_log")
+    assert not matches("Mine 1 oak log", "birch_log")
+
+
+def test_mined_blocks_drop_items():
+    assert matches("Mine 3 stone", "cobblestone")
+    assert not matches("Mine 3 stone", "stone")
+    assert matches("Mine 1 iron ore", "raw_iron")
+    assert matches("Mine 2 diamond ores", "diamond")
+
+
+def test_smelt_goals_need_the_furnace_output():
+    assert matches("Smelt 1 raw iron", "iron_ingot")
+    assert not matches("Smelt 1 raw iron", "raw_iron")
+    assert matches("Smelt 2 iron ores", "iron_ingot")
+    assert matches("Smelt 1 raw gold", "gold_ingot")
+    assert matches("Smelt 4 sand", "glass")
+    assert not matches("Smelt 4 sand", "sand")
+    assert matches("Smelt 3 cobblestone", "stone")
+    assert not matches("Smelt 3 cobblestone", "cobblestone")
+    assert matches("Smelt 1 oak log", "charcoal")
+    assert matches("Smelt 2 beef", "cooked_beef")
+
+
+def test_smelt_goals_naming_the_output():
+    assert matches("Smelt 3 iron ingots", "iron_ingot")
+    assert matches("Smelt 1 glass", "glass")
+    assert matches("Smelt 2 stone", "stone")
+    assert matches("Smelt 2 stone", "smooth_stone")
+
+
+def test_no_goal_for_unknown_smelt_items():
+    assert goal("Smelt 1 iron") is None
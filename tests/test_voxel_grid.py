@@ -0,0 +1,59 @@
+import base64
+import struct
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from voyager.env.voxel_grid import VoxelGrid
+
+AIR, DIRT, STONE, GRASS = 0, 10, 1, 9
+UNLOADED = VoxelGrid.UNLOADED
+
+
+def observation(ids, shape, palette):
+    # ids ordered by x, then y, then z varying fastest like mineflayer's grid
+    return {
+        "origin": [-1, 60, 4],
+        "shape": shape,
+        "dtype": "<u2",
+        "data": base64.b64encode(struct.pack(f"<{len(ids)}H", *ids)).decode(),
+        "palette": {str(state_id): name for state_id, name in palette.items()},
+    }
+
+
+IDS = [
+    # x = 0
+    STONE, DIRT, AIR,
+    STONE, GRASS, UNLOADED,
+    # x = 1
+    STONE, STONE, DIRT,
+    AIR, AIR, UNLOADED,
+]
+PALETTE = {AIR: "air", DIRT: "dirt", STONE: "stone", GRASS: "grass_block"}
+
+
+def test_decodes_blocks_in_grid_order():
+    grid = VoxelGrid(observation(IDS, [2, 2, 3], PALETTE))
+    assert grid.blocks.shape == (2, 2, 3)
+    assert grid.blocks.dtype == np.uint16
+    assert grid.blocks[0, 1, 1] == GRASS
+    assert grid.blocks[1, 0, 2] == DIRT
+    assert grid.blocks[1, 1, 2] == UNLOADED
+    assert grid.origin.tolist() == [-1, 60, 4]
+    assert grid.palette[GRASS] == "grass_block"
+
+
+def test_counts_leave_out_air_and_unloaded_blocks():
+    grid = VoxelGrid(observation(IDS, [2, 2, 3], PALETTE))
+    assert grid.counts() == {"stone": 4, "dirt": 2, "grass_block": 1}
+    assert sorted(grid.names()) == ["dirt", "grass_block", "stone"]
+
+
+def test_mask_covers_every_state_of_a_block():
+    # two state ids of the same block, e.g. different orientations
+    palette = {AIR: "air", 20: "oak_log", 21: "oak_log"}
+    grid = VoxelGrid(observation([20, 0, 21, 21], [1, 2, 2], palette))
+    assert grid.mask("oak_log").tolist() == [[[True, False], [True, True]]]
+    assert grid.counts() == {"oak_log": 3}
+    assert not grid.mask("stone").any()
@@ -0,0 +1,129 @@
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("gymnasium")
+
+from voyager.env.bridge import VoyagerEnv
+
+MINEFLAYER_DIR = os.path.join(
+    os.path.dirname(__file__), "..", "voyager", "env", "mineflayer"
+)
+EVENTS = [
+    ["onChat", {"onChat": "hello"}],
+    ["observe", {"inventory": {"oak_log": 3}, "voxels": "x" * 2048}],
+]
+# serves EVENTS through lib/wire.js, without @msgpack/msgpack when asked to
+SERVER = """
+const Module = require("module");
+const load = Module._load;
+if (process.argv[1] === "missing") {
+    Module._load = function (request, ...args) {
+        if (request === "@msgpack/msgpack") throw new Error("missing");
+        return load.call(this, request, ...args);
+    };
+}
+const wire = require("./lib/wire");
+const app = require("express")();
+app.get("/", (req, res) => wire.send(req, res, %s));
+const server = app.listen(0, "127.0.0.1", () => {
+    console.log(server.address().port);
+});
+process.stdin.on("end", () => process.exit(0)).resume();
+"""
+
+
+def node_modules_available():
+    if shutil.which("node") is None:
+        return False
+    check = subprocess.run(
+        ["node", "-e", "require('express'); require('@msgpack/msgpack')"],
+        cwd=MINEFLAYER_DIR,
+        capture_output=True,
+    )
+    return check.returncode == 0
+
+
+def env(wire_format, compress):
+    return VoyagerEnv(
+        mc_port=25565,
+        wire_format=wire_format,
+        compress=compress,
+        mineflayer=object(),
+    )
+
+
+def fetch(wire_format, compress, msgpack_missing=False):
+    """
+    Asks a node server for EVENTS with the headers of a VoyagerEnv and
+    returns the reply and the events decoded by the env.
+    """
+    server = subprocess.Popen(
+        ["node", "-e", SERVER % json.dumps(EVENTS)]
+        + (["missing"] if msgpack_missing else []),
+        cwd=MINEFLAYER_DIR,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    client = env(wire_format, compress)
+    try:
+        port = int(server.stdout.readline())
+        res = client.session.get(f"http://127.0.0.1:{port}/")
+        return res, client.decode_body(res.headers["Content-Type"], res.content)
+    finally:
+        client.session.close()
+        server.stdin.close()
+        server.wait(timeout=10)
+
+
+def test_decode_json():
+    assert env("json", False).decode_body(
+        "application/json; charset=utf-8", json.dumps(EVENTS).encode()
+    ) == EVENTS
+
+
+def test_decode_msgpack():
+    msgpack = pytest.importorskip("msgpack")
+    assert env("msgpack", False).decode_body(
+        "application/msgpack", msgpack.packb(EVENTS)
+    ) == EVENTS
+
+
+def test_rejects_unknown_wire_format():
+    with pytest.raises(ValueError):
+        env("protobuf", False)
+
+
+@pytest.fixture
+def node_server():
+    pytest.importorskip("msgpack")
+    if not node_modules_available():
+        pytest.skip("node, express or @msgpack/msgpack not installed")
+
+
+@pytest.mark.parametrize(
+    "wire_format, compress, content_type, encoding",
+    [
+        ("json", False, "application/json", None),
+        ("json", True, "application/json", "gzip"),
+        ("msgpack", False, "application/msgpack", None),
+        ("msgpack", True, "application/msgpack", "gzip"),
+    ],
+)
+def test_round_trip(node_server, wire_format, compress, content_type, encoding):
+    res, events = fetch(wire_format, compress)
+    assert res.headers["Content-Type"].startswith(content_type)
+    assert res.headers.get("Content-Encoding") == encoding
+    assert events == EVENTS
+
+
+def test_round_trip_falls_back_to_json(node_server):
+    res, events = fetch("msgpack", True, msgpack_missing=True)
+    assert res.headers["Content-Type"].startswith("application/json")
+    assert res.headers["Content-Encoding"] == "gzip"
+    assert events == EVENTS
@@ -1 +1,11 @@
-from .voyager import Voyager
+__all__ = ["Voyager"]
+
+
+# Voyager pulls in langchain, chromadb and gymnasium, it is only imported on
+# first use so that voyager.utils, voyager.prompts and voyager.env load fast
+def __getattr__(name):
+    if name == "Voyager":
+        from .voyager import Voyager
+
+        return Voyager
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,4 +1,20 @@
-from .action import ActionAgent
-from .critic import CriticAgent
-from .curriculum import CurriculumAgent
-from .skill import SkillManager
+import importlib
+
+# name -> submodule, imported on first use
+_exports = {
+    "ActionAgent": ".action",
+    "CriticAgent": ".critic",
+    "CurriculumAgent": ".curriculum",
+    "SkillManager": ".skill",
+    "LLMCache": ".llm_cache",
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_exports[name], __name__), name)
+    globals()[name] = value
+    return value
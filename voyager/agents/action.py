@@ -2,13 +2,27 @@ import re
 import time
 
 import voyager.utils as U
-from javascript import require
 from langchain.chat_models import ChatOpenAI
-from langchain.prompts import SystemMessagePromptTemplate
 from langchain.schema import AIMessage, HumanMessage, SystemMessage
 
-from voyager.prompts import load_prompt
-from voyager.control_primitives_context import load_control_primitives_context
+from voyager.prompts import prompt_path, registry
+from voyager.control_primitives_context import primitive_context_path
+from .program_parser import ProgramParseError, parse_program
+
+CODE_PATTERN = re.compile(r"```(?:javascript|js)(.*?)```", re.DOTALL)
+
+
+def compile_action_template(system_template, response_format, *primitives):
+    """
+    The action system message split around the skills, which are the only
+    part that changes between steps: everything up to and including the
+    base primitives, and everything after them.
+    """
+    marker = "\0programs\0"
+    prefix, suffix = system_template.format(
+        programs=marker, response_format=response_format
+    ).split(marker)
+    return prefix + "\n\n".join(primitives), suffix
 
 
 class ActionAgent:
@@ -73,7 +87,6 @@ class ActionAgent:
             return f"Chests: None\n\n"
 
     def render_system_message(self, skills=[]):
-        system_template = load_prompt("action_template")
         # FIXME: Hardcoded control_primitives
         base_skills = [
             "exploreUntil",
@@ -88,16 +101,13 @@ class ActionAgent:
                 "useChest",
                 "mineflayer",
             ]
-        programs = "\n\n".join(load_control_primitives_context(base_skills) + skills)
-        response_format = load_prompt("action_response_format")
-        system_message_prompt = SystemMessagePromptTemplate.from_template(
-            system_template
-        )
-        system_message = system_message_prompt.format(
-            programs=programs, response_format=response_format
+        prefix, suffix = registry.compile(
+            ("action_system_message", *base_skills),
+            [prompt_path("action_template"), prompt_path("action_response_format")]
+            + [primitive_context_path(name) for name in base_skills],
+            compile_action_template,
         )
-        assert isinstance(system_message, SystemMessage)
-        return system_message
+        return SystemMessage(content="\n\n".join([prefix] + skills) + suffix)
 
     def render_human_message(
         self, *, events, code="", task="", context="", critique=""
@@ -109,7 +119,10 @@ class ActionAgent:
         assert events[-1][0] == "observe", "Last event must be observe"
         for i, (event_type, event) in enumerate(events):
             if event_type == "onChat":
-                chat_messages.append(event["onChat"])
+                if event.get("repeat", 1) > 1:
+                    chat_messages.append(f"{event['onChat']} (x{event['repeat']})")
+                else:
+                    chat_messages.append(event["onChat"])
             elif event_type == "onError":
                 error_messages.append(event["onError"])
             elif event_type == "onDamage":
@@ -201,59 +214,47 @@ class ActionAgent:
     def process_ai_message(self, message):
         assert isinstance(message, AIMessage)
 
+        code = "\n".join(CODE_PATTERN.findall(message.content))
         retry = 3
         error = None
         while retry > 0:
             try:
-                babel = require("@babel/core")
-                babel_generator = require("@babel/generator").default
-
-                code_pattern = re.compile(r"```(?:javascript|js)(.*?)```", re.DOTALL)
-                code = "\n".join(code_pattern.findall(message.content))
-                parsed = babel.parse(code)
-                functions = []
-                assert len(list(parsed.program.body)) > 0, "No functions found"
-                for i, node in enumerate(parsed.program.body):
-                    if node.type != "FunctionDeclaration":
-                        continue
-                    node_type = (
-                        "AsyncFunctionDeclaration"
-                        if node["async"]
-                        else "FunctionDeclaration"
-                    )
-                    functions.append(
-                        {
-                            "name": node.id.name,
-                            "type": node_type,
-                            "body": babel_generator(node).code,
-                            "params": list(node["params"]),
-                        }
-                    )
-                # find the last async function
-                main_function = None
-                for function in reversed(functions):
-                    if function["type"] == "AsyncFunctionDeclaration":
-                        main_function = function
-                        break
-                assert (
-                    main_function is not None
-                ), "No async function found. Your main function must be async."
-                assert (
-                    len(main_function["params"]) == 1
-                    and main_function["params"][0].name == "bot"
-                ), f"Main function {main_function['name']} must take a single argument named 'bot'"
-                program_code = "\n\n".join(function["body"] for function in functions)
-                exec_code = f"await {main_function['name']}(bot);"
-                return {
-                    "program_code": program_code,
-                    "program_name": main_function["name"],
-                    "exec_code": exec_code,
-                }
+                parsed = parse_program(code)
+                break
+            except ProgramParseError as e:
+                # a syntax error stays a syntax error, no point retrying
+                return f"Error parsing action response (before program execution): {e}"
             except Exception as e:
                 retry -= 1
                 error = e
                 time.sleep(1)
-        return f"Error parsing action response (before program execution): {error}"
+        else:
+            return f"Error parsing action response (before program execution): {error}"
+
+        try:
+            assert parsed["statements"] > 0, "No functions found"
+            functions = parsed["functions"]
+            # find the last async function
+            main_function = None
+            for function in reversed(functions):
+                if function["async"]:
+                    main_function = function
+                    break
+            assert (
+                main_function is not None
+            ), "No async function found. Your main function must be async."
+            assert (
+                main_function["params"] == ["bot"]
+            ), f"Main function {main_function['name']} must take a single argument named 'bot'"
+        except AssertionError as e:
+            return f"Error parsing action response (before program execution): {e}"
+        program_code = "\n\n".join(function["body"] for function in functions)
+        exec_code = f"await {main_function['name']}(bot);"
+        return {
+            "program_code": program_code,
+            "program_name": main_function["name"],
+            "exec_code": exec_code,
+        }
 
     def summarize_chatlog(self, events):
         def filter_item(message: str):
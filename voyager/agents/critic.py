@@ -1,5 +1,6 @@
 from voyager.prompts import load_prompt
 from voyager.utils.json_utils import fix_and_parse_json
+from voyager.agents.llm_cache import discard_response
 from langchain.chat_models import ChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage
 
@@ -108,6 +109,7 @@ class CriticAgent:
             return response["success"], response["critique"]
         except Exception as e:
             print(f"\033[31mError parsing critic response: {e} Trying again!\033[0m")
+            discard_response(self.llm, messages)
             return self.ai_check_task_success(
                 messages=messages,
                 max_retries=max_retries - 1,
@@ -2,14 +2,99 @@ from __future__ import annotations
 
 import random
 import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 import voyager.utils as U
 from voyager.prompts import load_prompt
 from voyager.utils.json_utils import fix_and_parse_json
+from voyager.agents.llm_cache import discard_response
 from langchain.chat_models import ChatOpenAI
-from langchain.embeddings.openai import OpenAIEmbeddings
 from langchain.schema import HumanMessage, SystemMessage
-from langchain.vectorstores import Chroma
+
+TASK_GOAL_PATTERN = re.compile(r"^(mine|craft|smelt|kill)\s+(\d+)\s+([a-z_ ]+?)\.?$", re.I)
+# words in task names that don't narrow the item down, e.g. "Mine 1 wood log"
+GENERIC_TASK_WORDS = {"any", "wood"}
+# items that come in one variant per wood type, "Mine 1 log" is met by any log
+WOOD_TYPES = [
+    "oak",
+    "spruce",
+    "birch",
+    "jungle",
+    "acacia",
+    "dark_oak",
+    "mangrove",
+    "cherry",
+    "crimson",
+    "warped",
+]
+WOOD_ITEMS = {"log", "planks", "wood", "leaves", "sapling"}
+# items ending up in the inventory when mining a block
+MINED_ITEMS = {
+    "stone": "cobblestone",
+    "grass_block": "dirt",
+    "coal_ore": "coal",
+    "iron_ore": "raw_iron",
+    "gold_ore": "raw_gold",
+    "copper_ore": "raw_copper",
+    "diamond_ore": "diamond",
+    "emerald_ore": "emerald",
+    "lapis_ore": "lapis_lazuli",
+    "lapis_lazuli_ore": "lapis_lazuli",
+    "redstone_ore": "redstone",
+}
+# questions closer than this to a cached one get its answer, in the
+# squared L2 distance chroma uses
+QA_CACHE_DISTANCE = 0.05
+# furnace outputs, a smelt task is met by the output and never by the input,
+# which the bot may just be collecting. Logs and wood smelt into charcoal.
+SMELTED_ITEMS = {
+    "raw_iron": "iron_ingot",
+    "iron_ore": "iron_ingot",
+    "raw_gold": "gold_ingot",
+    "gold_ore": "gold_ingot",
+    "raw_copper": "copper_ingot",
+    "copper_ore": "copper_ingot",
+    "ancient_debris": "netherite_scrap",
+    "sand": "glass",
+    "red_sand": "glass",
+    "cobblestone": "stone",
+    "stone": "smooth_stone",
+    "clay_ball": "brick",
+    "netherrack": "nether_brick",
+    "beef": "cooked_beef",
+    "porkchop": "cooked_porkchop",
+    "chicken": "cooked_chicken",
+    "mutton": "cooked_mutton",
+    "rabbit": "cooked_rabbit",
+    "cod": "cooked_cod",
+    "salmon": "cooked_salmon",
+    "potato": "baked_potato",
+    "kelp": "dried_kelp",
+    "cactus": "green_dye",
+}
+
+
+
+def squared_distance(a, b):
+    return sum((x - y) ** 2 for x, y in zip(a, b))
+
+
+def get_smelt_goal(words, stems, count):
+    # "Smelt 1 raw iron" names the input, "Smelt 1 iron ingot" the output
+    outputs = set()
+    for stem in stems:
+        name = "_".join(words + [stem])
+        if name in SMELTED_ITEMS.values():
+            outputs.add(name)
+        if name in SMELTED_ITEMS:
+            outputs.add(SMELTED_ITEMS[name])
+        elif name in {"log", "wood"} or name.endswith(("_log", "_wood")):
+            outputs.add("charcoal")
+    if not outputs:
+        return None
+    pattern = f"^(?:{'|'.join(sorted(outputs))})$"
+    return {"type": "inventory", "pattern": pattern, "count": count}
 
 
 class CurriculumAgent:
@@ -19,6 +104,7 @@ class CurriculumAgent:
         temperature=0,
         qa_model_name="gpt-3.5-turbo",
         qa_temperature=0,
+        qa_workers=4,
         request_timout=120,
         ckpt_dir="ckpt",
         resume=False,
@@ -42,6 +128,8 @@ class CurriculumAgent:
         ], f"mode {mode} not supported"
         self.mode = mode
         self.ckpt_dir = ckpt_dir
+        # questions answered at once by run_qa
+        self.qa_workers = qa_workers
         U.f_mkdir(f"{ckpt_dir}/curriculum/vectordb")
         if resume:
             print(f"\033[35mLoading Curriculum Agent from {ckpt_dir}/curriculum\033[0m")
@@ -54,7 +142,10 @@ class CurriculumAgent:
             self.completed_tasks = []
             self.failed_tasks = []
             self.qa_cache = {}
-        # vectordb for qa cache
+        # vectordb for qa cache, chromadb is only imported once it is needed
+        from langchain.embeddings.openai import OpenAIEmbeddings
+        from langchain.vectorstores import Chroma
+
         self.qa_cache_questions_vectordb = Chroma(
             collection_name="qa_cache_questions_vectordb",
             embedding_function=OpenAIEmbeddings(),
@@ -303,6 +394,7 @@ class CurriculumAgent:
             print(
                 f"\033[35mError parsing curriculum response: {e}. Trying again!\033[0m"
             )
+            discard_response(self.llm, messages)
             return self.propose_next_ai_task(
                 messages=messages,
                 max_retries=max_retries - 1,
@@ -385,35 +477,94 @@ class CurriculumAgent:
         questions_new, _ = self.run_qa_step1_ask_questions(
             events=events, chest_observation=chest_observation
         )
-        questions = []
-        answers = []
-        for question in questions_new:
-            if self.qa_cache_questions_vectordb._collection.count() > 0:
-                docs_and_scores = (
-                    self.qa_cache_questions_vectordb.similarity_search_with_score(
-                        question, k=1
-                    )
+        vectordb = self.qa_cache_questions_vectordb
+        # one embedding call and one lookup for all questions
+        embeddings = vectordb._embedding_function.embed_documents(questions_new)
+        matches = [None] * len(questions_new)
+        if vectordb._collection.count() > 0:
+            result = vectordb._collection.query(
+                query_embeddings=embeddings,
+                n_results=1,
+                include=["documents", "distances"],
+            )
+            for i, (documents, distances) in enumerate(
+                zip(result["documents"], result["distances"])
+            ):
+                if documents and distances[0] < QA_CACHE_DISTANCE:
+                    assert documents[0] in self.qa_cache
+                    matches[i] = documents[0]
+        # answer the misses concurrently, a miss close to another miss of
+        # the batch gets that one's answer
+        misses = {}
+        for i, (question, embedding) in enumerate(zip(questions_new, embeddings)):
+            if matches[i] is not None:
+                continue
+            for miss, miss_embedding in misses.items():
+                if squared_distance(embedding, miss_embedding) < QA_CACHE_DISTANCE:
+                    matches[i] = miss
+                    break
+            else:
+                misses[question] = embedding
+        if misses:
+            with ThreadPoolExecutor(max_workers=self.qa_workers) as executor:
+                answers_new = list(
+                    executor.map(self.run_qa_step2_answer_questions, misses)
                 )
-                if docs_and_scores and docs_and_scores[0][1] < 0.05:
-                    question_cached = docs_and_scores[0][0].page_content
-                    assert question_cached in self.qa_cache
-                    answer_cached = self.qa_cache[question_cached]
-                    questions.append(question_cached)
-                    answers.append(answer_cached)
-                    continue
-            answer = self.run_qa_step2_answer_questions(question=question)
-            assert question not in self.qa_cache
-            self.qa_cache[question] = answer
-            self.qa_cache_questions_vectordb.add_texts(
-                texts=[question],
+            for question, answer in zip(misses, answers_new):
+                assert question not in self.qa_cache
+                self.qa_cache[question] = answer
+            vectordb._collection.add(
+                ids=[str(uuid.uuid1()) for _ in misses],
+                embeddings=list(misses.values()),
+                documents=list(misses),
             )
             U.dump_json(self.qa_cache, f"{self.ckpt_dir}/curriculum/qa_cache.json")
-            self.qa_cache_questions_vectordb.persist()
-            questions.append(question)
-            answers.append(answer)
+            vectordb.persist()
+        questions = [
+            match if match is not None else question
+            for question, match in zip(questions_new, matches)
+        ]
+        answers = [self.qa_cache[question] for question in questions]
         assert len(questions_new) == len(questions) == len(answers)
         return questions, answers
 
+    def get_task_goal(self, task):
+        """
+        Machine readable goal of a "Mine/Craft/Smelt/Kill N X" task for the
+        mineflayer step to finish early once it is met, None for other tasks.
+        """
+        match = TASK_GOAL_PATTERN.match(task.strip())
+        if not match:
+            return None
+        verb, count, target = match.groups()
+        words = target.lower().replace("_", " ").split()
+        # match plurals like "logs", "torches" and "oak leaves" alike
+        last = words[-1]
+        stems = {last, last[:-1] if last.endswith("s") else last}
+        if last.endswith("es"):
+            stems.add(last[:-2])
+        if verb.lower() == "mine":
+            for stem in stems:
+                mined = MINED_ITEMS.get("_".join(words[:-1] + [stem]))
+                if mined:
+                    return {"type": "inventory", "pattern": f"^{mined}$", "count": int(count)}
+        # the exact item name, only wood items without a wood type stand for
+        # all of their variants
+        words = [word for word in words[:-1] if word not in GENERIC_TASK_WORDS]
+        if verb.lower() == "smelt":
+            return get_smelt_goal(words, stems, int(count))
+        names = []
+        for stem in sorted(stems):
+            name = "_".join(words + [stem])
+            if name in WOOD_ITEMS:
+                names.append(f"(?:{'|'.join(WOOD_TYPES)})_{name}")
+            else:
+                names.append(re.escape(name))
+        pattern = f"^(?:{'|'.join(names)})$"
+        if verb.lower() == "kill":
+            return {"type": "kill", "pattern": pattern, "count": int(count)}
+        return {"type": "inventory", "pattern": pattern, "count": int(count)}
+
     def get_task_context(self, task):
         # if include ore in question, gpt will try to use tool with skill touch enhancement to mine
         question = (
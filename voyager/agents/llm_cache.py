@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from langchain.schema import AIMessage
+
+
+class LLMCacheMiss(LookupError):
+    """
+    A replayed run asked for a response that was never recorded.
+    """
+
+
+class LLMCache:
+    """
+    Chat model responses in SQLite keyed by model, temperature and the exact
+    messages. Least recently used responses are evicted once the stored
+    responses exceed max_bytes.
+
+    Modes:
+        read_write: return cached responses, ask the model and store on a miss
+        record: always ask the model and store the response
+        replay: only return cached responses, a miss raises LLMCacheMiss
+    """
+
+    modes = ["read_write", "record", "replay"]
+
+    def __init__(self, path, mode="read_write", max_bytes=256 * 1024 * 1024):
+        if mode not in self.modes:
+            raise ValueError(f"Unsupported llm cache mode {mode}")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # agent name -> [hits, misses]
+        self.counts = {}
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # several agents and processes can share the file
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, temperature REAL, "
+            "response TEXT, size INTEGER, last_used REAL)"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_used "
+            "ON responses (last_used)"
+        )
+        self.db.commit()
+
+    def key(self, model, temperature, messages):
+        content = json.dumps(
+            [model, temperature, [[m.type, m.content] for m in messages]]
+        )
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.db.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self.db.commit()
+            return row[0]
+
+    def delete(self, key):
+        with self.lock:
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.db.commit()
+
+    def put(self, key, model, temperature, response):
+        size = len(response.encode())
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, temperature, response, size, time.time()),
+            )
+            self.evict()
+            self.db.commit()
+
+    def evict(self):
+        total = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in self.db.execute(
+            "SELECT key, size FROM responses ORDER BY last_used"
+        ):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self.db.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def count(self, name, hit):
+        with self.lock:
+            counts = self.counts.setdefault(name, [0, 0])
+            counts[0 if hit else 1] += 1
+
+    def hit_rates(self):
+        with self.lock:
+            return {
+                name: hits / (hits + misses)
+                for name, (hits, misses) in self.counts.items()
+            }
+
+    def wrap(self, llm, name):
+        return CachedChatModel(llm, self, name)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def discard_response(llm, messages):
+    """
+    Drop the cached response to messages after the caller could not use it,
+    so asking again with the same messages reaches the model instead of
+    returning the same response. Does nothing for models without a cache.
+    """
+    if isinstance(llm, CachedChatModel):
+        llm.discard(messages)
+
+
+class CachedChatModel:
+    """
+    Calls a chat model through an LLMCache, other attributes are those of
+    the wrapped model.
+    """
+
+    def __init__(self, llm, cache, name):
+        self.llm = llm
+        self.cache = cache
+        self.name = name
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def key(self, messages):
+        return self.cache.key(self.llm.model_name, self.llm.temperature, messages)
+
+    def discard(self, messages):
+        # a replayed run fails the way the recorded one did
+        if self.cache.mode != "replay":
+            self.cache.delete(self.key(messages))
+
+    def __call__(self, messages):
+        model = self.llm.model_name
+        temperature = self.llm.temperature
+        key = self.key(messages)
+        if self.cache.mode != "record":
+            response = self.cache.get(key)
+            self.cache.count(self.name, response is not None)
+            if response is not None:
+                return AIMessage(content=response)
+            if self.cache.mode == "replay":
+                raise LLMCacheMiss(
+                    f"No recorded {self.name} response for {model} at "
+                    f"temperature {temperature}"
+                )
+        else:
+            self.cache.count(self.name, False)
+        response = self.llm(messages).content
+        self.cache.put(key, model, temperature, response)
+        return AIMessage(content=response)
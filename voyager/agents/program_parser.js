@@ -0,0 +1,35 @@
+let babel = null;
+let generate = null;
+
+function init(babelCore, babelGenerator) {
+    babel = babelCore;
+    generate = babelGenerator.default || babelGenerator;
+}
+
+function paramName(param) {
+    return param.type === "Identifier" ? param.name : null;
+}
+
+// The top level function declarations of an action response as one JSON
+// string, so the whole extraction is a single call over the bridge. Syntax
+// errors are returned as {error}, parsing the same code again fails the same.
+function extract(code) {
+    let parsed;
+    try {
+        parsed = babel.parse(code, { babelrc: false, configFile: false });
+    } catch (err) {
+        return JSON.stringify({ error: err.message });
+    }
+    const body = parsed.program.body;
+    const functions = body
+        .filter((node) => node.type === "FunctionDeclaration")
+        .map((node) => ({
+            name: node.id.name,
+            async: node.async,
+            params: node.params.map(paramName),
+            body: generate(node).code,
+        }));
+    return JSON.stringify({ statements: body.length, functions });
+}
+
+module.exports = { init, extract };
@@ -0,0 +1,49 @@
+import functools
+import json
+import os
+import threading
+
+_parser = None
+_parser_lock = threading.Lock()
+
+
+class ProgramParseError(ValueError):
+    """
+    The code does not parse. Parsing it again fails the same way, so it is
+    not retried.
+    """
+
+
+def get_parser():
+    """
+    Load babel and the extraction module into the JSPyBridge node process
+    once, later parses reuse them.
+    """
+    global _parser
+    with _parser_lock:
+        if _parser is None:
+            from javascript import require
+
+            parser = require(
+                os.path.join(os.path.dirname(__file__), "program_parser.js")
+            )
+            parser.init(require("@babel/core"), require("@babel/generator"))
+            _parser = parser
+    return _parser
+
+
+@functools.lru_cache(maxsize=256)
+def _extract(code):
+    return get_parser().extract(code)
+
+
+def parse_program(code):
+    """
+    Returns the number of top level statements and the function declarations
+    of the code, each with its name, async flag, parameter names and code
+    regenerated by babel. Results are memoized by code.
+    """
+    parsed = json.loads(_extract(code))
+    if "error" in parsed:
+        raise ProgramParseError(parsed["error"])
+    return parsed
@@ -1,14 +1,19 @@
 import os
+import re
 
 import voyager.utils as U
 from langchain.chat_models import ChatOpenAI
-from langchain.embeddings.openai import OpenAIEmbeddings
 from langchain.schema import HumanMessage, SystemMessage
-from langchain.vectorstores import Chroma
 
 from voyager.prompts import load_prompt
 from voyager.control_primitives import load_control_primitives
 
+# top level function declarations of a program
+FUNCTION_PATTERN = re.compile(
+    r"^(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)", re.MULTILINE
+)
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_$][\w$]*")
+
 
 class SkillManager:
     def __init__(
@@ -30,13 +35,30 @@ class SkillManager:
         U.f_mkdir(f"{ckpt_dir}/skill/vectordb")
         # programs for env execution
         self.control_primitives = load_control_primitives()
+        self.primitive_calls = [
+            self.extract_calls(primitive) for primitive in self.control_primitives
+        ]
         if resume:
             print(f"\033[33mLoading Skill Manager from {ckpt_dir}/skill\033[0m")
             self.skills = U.load_json(f"{ckpt_dir}/skill/skills.json")
+            if U.f_exists(f"{ckpt_dir}/skill/call_graph.json"):
+                self.call_graph = U.load_json(f"{ckpt_dir}/skill/call_graph.json")
+            else:
+                self.call_graph = {}
         else:
             self.skills = {}
+            self.call_graph = {}
+        # skill libraries from before the call graph existed
+        for skill_name, entry in self.skills.items():
+            if skill_name not in self.call_graph:
+                self.call_graph[skill_name] = self.extract_calls(entry["code"])
+        self.owners = self.get_owners()
         self.retrieval_top_k = retrieval_top_k
         self.ckpt_dir = ckpt_dir
+        # chromadb is only imported once it is needed
+        from langchain.embeddings.openai import OpenAIEmbeddings
+        from langchain.vectorstores import Chroma
+
         self.vectordb = Chroma(
             collection_name="skill_vectordb",
             embedding_function=OpenAIEmbeddings(),
@@ -51,11 +73,60 @@ class SkillManager:
 
     @property
     def programs(self):
-        programs = ""
+        # one source per skill and primitive, the env registers them by hash
+        programs = [entry["code"] for entry in self.skills.values()]
+        programs += self.control_primitives
+        return programs
+
+    @staticmethod
+    def extract_calls(program_code):
+        # every identifier that is not declared by the program itself,
+        # over-approximates the calls so pruning never drops a callee
+        declared = set(FUNCTION_PATTERN.findall(program_code))
+        return sorted(set(IDENTIFIER_PATTERN.findall(program_code)) - declared)
+
+    def get_owners(self):
+        """
+        Maps each declared function name to the skill or control primitive
+        declaring it, rebuilt whenever the library changes.
+        """
+        owners = {}
         for skill_name, entry in self.skills.items():
-            programs += f"{entry['code']}\n\n"
-        for primitives in self.control_primitives:
-            programs += f"{primitives}\n\n"
+            for function_name in FUNCTION_PATTERN.findall(entry["code"]):
+                owners[function_name] = ("skill", skill_name)
+        for i, primitive in enumerate(self.control_primitives):
+            for function_name in FUNCTION_PATTERN.findall(primitive):
+                owners[function_name] = ("primitive", i)
+        return owners
+
+    def get_programs(self, code):
+        """
+        Returns the skills and control primitives reachable from code,
+        in the same order as `programs`.
+        """
+        reached = set()
+        pending = self.extract_calls(code)
+        while pending:
+            owner = self.owners.get(pending.pop())
+            if owner is None or owner in reached:
+                continue
+            reached.add(owner)
+            kind, key = owner
+            if kind == "skill":
+                pending.extend(self.call_graph[key])
+            else:
+                pending.extend(self.primitive_calls[key])
+
+        programs = [
+            entry["code"]
+            for skill_name, entry in self.skills.items()
+            if ("skill", skill_name) in reached
+        ]
+        programs += [
+            primitive
+            for i, primitive in enumerate(self.control_primitives)
+            if ("primitive", i) in reached
+        ]
         return programs
 
     def add_new_skill(self, info):
@@ -86,6 +157,8 @@ class SkillManager:
             "code": program_code,
             "description": skill_description,
         }
+        self.call_graph[program_name] = self.extract_calls(program_code)
+        self.owners = self.get_owners()
         assert self.vectordb._collection.count() == len(
             self.skills
         ), "vectordb is not synced with skills.json"
@@ -97,6 +170,7 @@ class SkillManager:
             f"{self.ckpt_dir}/skill/description/{dumped_program_name}.txt",
         )
         U.dump_json(self.skills, f"{self.ckpt_dir}/skill/skills.json")
+        U.dump_json(self.call_graph, f"{self.ckpt_dir}/skill/call_graph.json")
         self.vectordb.persist()
 
     def generate_skill_description(self, program_name, program_code):
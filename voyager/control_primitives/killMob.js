@@ -19,12 +19,8 @@ async function killMob(bot, mobName, timeout = 300) {
     ];
     const mainHandItem = bot.inventory.slots[bot.getEquipmentDestSlot("hand")];
 
-    const entity = bot.nearestEntity(
-        (entity) =>
-            entity.name === mobName &&
-            // kill mob distance should be slightly bigger than explore distance
-            entity.position.distanceTo(bot.entity.position) < 48
-    );
+    // kill mob distance should be slightly bigger than explore distance
+    const entity = bot.entityIndex.nearest(mobName, bot.entity.position, 48);
     if (!entity) {
         bot.chat(`No ${mobName} nearby, please explore first`);
         _killMobFailCount++;
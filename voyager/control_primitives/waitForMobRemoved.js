@@ -8,14 +8,12 @@ function waitForMobRemoved(bot, entity, timeout = 300) {
             bot.pvp.stop();
         }, timeout * 1000);
 
-        // Function to handle entityRemoved event
-        function onEntityGone(e) {
-            if (e === entity) {
-                success = true;
-                clearTimeout(timeoutId);
-                bot.chat(`Killed ${entity.name}!`);
-                bot.pvp.stop();
-            }
+        // called by the entity index when this entity is gone
+        function onEntityGone() {
+            success = true;
+            clearTimeout(timeoutId);
+            bot.chat(`Killed ${entity.name}!`);
+            bot.pvp.stop();
         }
 
         function onItemDrop(item) {
@@ -26,15 +24,14 @@ function waitForMobRemoved(bot, entity, timeout = 300) {
 
         function onStoppedAttacking() {
             clearTimeout(timeoutId);
-            bot.removeListener("entityGone", onEntityGone);
+            stopWatching();
             bot.removeListener("stoppedAttacking", onStoppedAttacking);
             bot.removeListener("itemDrop", onItemDrop);
             if (!success) reject(new Error(`Failed to kill ${entity.name}.`));
             else resolve(droppedItem);
         }
 
-        // Listen for entityRemoved event
-        bot.on("entityGone", onEntityGone);
+        const stopWatching = bot.entityIndex.onGone(entity, onEntityGone);
         bot.on("stoppedAttacking", onStoppedAttacking);
         bot.on("itemDrop", onItemDrop);
     });
@@ -51,14 +48,12 @@ function waitForMobShot(bot, entity, timeout = 300) {
             bot.hawkEye.stop();
         }, timeout * 1000);
 
-        // Function to handle entityRemoved event
-        function onEntityGone(e) {
-            if (e === entity) {
-                success = true;
-                clearTimeout(timeoutId);
-                bot.chat(`Shot ${entity.name}!`);
-                bot.hawkEye.stop();
-            }
+        // called by the entity index when this entity is gone
+        function onEntityGone() {
+            success = true;
+            clearTimeout(timeoutId);
+            bot.chat(`Shot ${entity.name}!`);
+            bot.hawkEye.stop();
         }
 
         function onItemDrop(item) {
@@ -69,15 +64,14 @@ function waitForMobShot(bot, entity, timeout = 300) {
 
         function onAutoShotStopped() {
             clearTimeout(timeoutId);
-            bot.removeListener("entityGone", onEntityGone);
+            stopWatching();
             bot.removeListener("auto_shot_stopped", onAutoShotStopped);
             bot.removeListener("itemDrop", onItemDrop);
             if (!success) reject(new Error(`Failed to shoot ${entity.name}.`));
             else resolve(droppedItem);
         }
 
-        // Listen for entityRemoved event
-        bot.on("entityGone", onEntityGone);
+        const stopWatching = bot.entityIndex.onGone(entity, onEntityGone);
         bot.on("auto_shot_stopped", onAutoShotStopped);
         bot.on("itemDrop", onItemDrop);
     });
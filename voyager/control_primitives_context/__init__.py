@@ -1,18 +1,20 @@
-import pkg_resources
 import os
-import voyager.utils as U
+from voyager.prompts import PACKAGE_PATH, registry
+
+
+def primitive_context_path(primitive_name):
+    return f"{PACKAGE_PATH}/control_primitives_context/{primitive_name}.js"
 
 
 def load_control_primitives_context(primitive_names=None):
-    package_path = pkg_resources.resource_filename("voyager", "")
     if primitive_names is None:
         primitive_names = [
             primitive[:-3]
-            for primitive in os.listdir(f"{package_path}/control_primitives_context")
+            for primitive in os.listdir(f"{PACKAGE_PATH}/control_primitives_context")
             if primitive.endswith(".js")
         ]
     primitives = [
-        U.load_text(f"{package_path}/control_primitives_context/{primitive_name}.js")
+        registry.load(primitive_context_path(primitive_name))
         for primitive_name in primitive_names
     ]
     return primitives
@@ -1 +1,19 @@
-from .bridge import VoyagerEnv
+import importlib
+
+# name -> submodule, imported on first use
+_exports = {
+    "VoyagerEnv": ".bridge",
+    "get_mineflayer_process": ".bridge",
+    "AsyncVoyagerEnv": ".async_bridge",
+    "VoxelGrid": ".voxel_grid",
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_exports[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,202 @@
+import asyncio
+import json
+from typing import SupportsFloat, Any, Tuple, Dict, List, Union
+
+from gymnasium.core import ObsType
+
+from .bridge import VoyagerEnv
+
+
+class AsyncVoyagerEnv:
+    """
+    Async reset, step, pause and close of a VoyagerEnv over one pooled
+    keep-alive aiohttp session, so a single event loop can drive many agents
+    without a thread each. The decisions and the state stay with the wrapped
+    VoyagerEnv, only the requests are sent differently. Starting and stopping
+    the minecraft and mineflayer processes still blocks and runs in a worker
+    thread. Other attributes are those of the wrapped env.
+    """
+
+    def __init__(self, *args, connection_limit=100, **kwargs):
+        self.env = VoyagerEnv(*args, **kwargs)
+        self.connection_limit = connection_limit
+        self.client = None
+
+    def __getattr__(self, name):
+        return getattr(self.env, name)
+
+    def get_client(self):
+        import aiohttp
+
+        if self.client is None or self.client.closed:
+            self.client = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connection_limit),
+                timeout=aiohttp.ClientTimeout(total=self.env.request_timeout),
+                headers=self.env.request_headers,
+            )
+        return self.client
+
+    async def post(self, path, data):
+        """
+        Returns the status code and the decoded body of a successful reply.
+        """
+        async with self.get_client().post(f"{self.env.server}{path}", json=data) as res:
+            if res.status != 200:
+                return res.status, None
+            content = await res.read()
+            return res.status, self.env.decode_body(res.content_type, content)
+
+    async def check_process(self):
+        if await asyncio.to_thread(self.env.restart_process):
+            return await self.start_bot()
+
+    async def start_bot(self):
+        status, returned_data = await self.post("/start", self.env.reset_options)
+        if status != 200:
+            await asyncio.to_thread(self.env.start_failed, status)
+        return returned_data
+
+    async def post_step(self, data, programs):
+        """
+        Returns the open response of a successful step, the caller reads and
+        releases it.
+        """
+        client = self.get_client()
+        res = await client.post(f"{self.env.server}/step", json=data)
+        if self.env.bot_lost(res.status):
+            res.release()
+            await self.start_bot()
+            res = await client.post(f"{self.env.server}/step", json=data)
+        if self.env.programs_lost(res.status, data, programs):
+            res.release()
+            res = await client.post(f"{self.env.server}/step", json=data)
+        if res.status != 200:
+            res.release()
+        self.env.step_done(res.status, data, programs)
+        return res
+
+    async def step(
+        self,
+        code: str,
+        programs: Union[str, List[str]] = "",
+        budget_s: float = None,
+        goal: Dict[str, Any] = None,
+        observers: List[str] = None,
+        observer_options: Dict[str, Any] = None,
+    ) -> Tuple[ObsType, SupportsFloat, bool, bool, Dict[str, Any]]:
+        self.env.check_reset()
+        await self.check_process()
+
+        data = self.env.get_step_data(
+            code, programs, budget_s, goal, observers, observer_options
+        )
+        async with await self.post_step(data, programs) as res:
+            events = self.env.decode_body(res.content_type, await res.read())
+        if events:
+            self.env.rebuild_event(events[-1])
+        return events
+
+    async def stream_step(
+        self,
+        code: str,
+        programs: Union[str, List[str]] = "",
+        budget_s: float = None,
+        goal: Dict[str, Any] = None,
+        observers: List[str] = None,
+        observer_options: Dict[str, Any] = None,
+    ):
+        """
+        Run a step and yield its events while the code runs, the last one is
+        the final observe event.
+        """
+        self.env.check_reset()
+        await self.check_process()
+
+        data = self.env.get_step_data(
+            code, programs, budget_s, goal, observers, observer_options
+        )
+        data["stream"] = True
+        async with await self.post_step(data, programs) as res:
+            async for line in res.content:
+                line = line.strip()
+                if line:
+                    yield self.env.rebuild_event(json.loads(line))
+
+    async def cancel(self, reason=None):
+        try:
+            status, _ = await self.post("/cancel", self.env.cancel_payload(reason))
+        except Exception:
+            return False
+        return status == 200
+
+    async def reset(
+        self,
+        *,
+        seed=None,
+        options=None,
+    ) -> Tuple[ObsType, Dict[str, Any]]:
+        self.env.reset_options = self.env.get_reset_options(options)
+
+        returned_data = None
+        if self.env.wants_soft_reset():
+            returned_data = await self.soft_reset()
+        if returned_data is None:
+            await asyncio.to_thread(self.env.stop_for_hard_reset)
+            returned_data = await self.check_process()
+            if returned_data is None:
+                returned_data = await self.start_bot()
+        return self.env.reset_done(returned_data)
+
+    async def soft_reset(self):
+        if not self.env.can_soft_reset():
+            return None
+        try:
+            status, returned_data = await self.post("/reset", self.env.reset_options)
+        except Exception:
+            return None
+        return returned_data
+
+    async def attach_viewer(self):
+        try:
+            status, reply = await self.post("/viewer", self.env.bot_payload())
+        except Exception:
+            return None
+        return reply["port"] if status == 200 else None
+
+    async def detach_viewer(self):
+        try:
+            status, _ = await self.post("/viewer", self.env.bot_payload(close=True))
+        except Exception:
+            return False
+        return status == 200
+
+    async def close(self):
+        await self.unpause()
+        if self.env.connected:
+            try:
+                status, _ = await self.post("/stop", self.env.bot_payload())
+                if status == 200:
+                    self.env.connected = False
+            except Exception:
+                pass
+        await asyncio.to_thread(self.env.stop_processes)
+        if self.client:
+            await self.client.close()
+        self.env.session.close()
+        return not self.env.connected
+
+    async def set_paused(self, paused):
+        if self.env.wants_pause_toggle(paused):
+            try:
+                status, _ = await self.post("/pause", self.env.bot_payload())
+                if status == 200:
+                    self.env.server_paused = paused
+            except Exception:
+                pass
+        return self.env.server_paused
+
+    async def pause(self):
+        return await self.set_paused(True)
+
+    async def unpause(self):
+        return await self.set_paused(False)
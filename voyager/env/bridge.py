@@ -1,18 +1,88 @@
+import hashlib
+import json
 import os.path
+import threading
 import time
 import warnings
-from typing import SupportsFloat, Any, Tuple, Dict
+from typing import SupportsFloat, Any, Tuple, Dict, List, Union
 
 import requests
-import json
 
 import gymnasium as gym
 from gymnasium.core import ObsType
 
 import voyager.utils as U
 
-from .minecraft_launcher import MinecraftInstance
 from .process_monitor import SubprocessMonitor
+from .process_pool import ProcessPool
+
+
+def check_health(server, process=None):
+    """
+    True when the mineflayer server answers /health, and when process is
+    given, when it is the one answering and not an old server on the port.
+    """
+    if process is not None and process.process is None:
+        return False
+    try:
+        res = requests.get(f"{server}/health", timeout=1)
+    except requests.exceptions.RequestException:
+        return False
+    if res.status_code != 200:
+        return False
+    return process is None or res.json().get("pid") == process.process.pid
+
+
+def apply_delta(previous, value):
+    """
+    Rebuild an observer value from a diff of mineflayer's delta encoding.
+    New containers are returned, previous values are never changed in place.
+    """
+    if isinstance(value, dict):
+        if "$same" in value:
+            return previous
+        if "$set" in value:
+            rebuilt = dict(previous)
+            rebuilt.update(value["$set"])
+            for key in value["$del"]:
+                rebuilt.pop(key, None)
+            return rebuilt
+        if "$add" in value:
+            removed = set(value["$del"])
+            return [item for item in previous if item not in removed] + value["$add"]
+    return value
+
+
+# observer options of a step and their names in the mineflayer request
+OBSERVER_OPTIONS = {
+    "voxel_radius": "voxelRadius",
+    "entity_radius": "entityRadius",
+    "chest_radius": "chestRadius",
+}
+
+
+def get_mineflayer_process(
+    server_port, name, log_path="./logs", server_host="http://127.0.0.1"
+):
+    """
+    A mineflayer server on server_port. One server can host the bots of
+    several VoyagerEnv, pass it to each of them as mineflayer.
+    """
+    log_dir = U.f_join(log_path, name)
+    U.f_mkdir(log_path, log_dir)
+    file_path = os.path.abspath(os.path.dirname(__file__))
+    server = f"{server_host}:{server_port}"
+    process = SubprocessMonitor(
+        commands=[
+            "node",
+            U.f_join(file_path, "mineflayer/index.js"),
+            str(server_port),
+        ],
+        name=f"{name}_{server_port}",
+        log_path=log_dir,
+        ready_check=lambda: check_health(server, process),
+    )
+    return process
 
 
 class VoyagerEnv(gym.Env):
@@ -25,8 +95,19 @@ class VoyagerEnv(gym.Env):
         request_timeout=600,
         log_path="./logs",
         bot_username="bot",
+        wire_format="json",
+        compress=False,
+        standby_processes=0,
+        standby_base_port=None,
+        mineflayer: SubprocessMonitor = None,
+        delta_observations=False,
+        headless=False,
     ):
         self.bot_username = bot_username
+        if wire_format not in ["json", "msgpack"]:
+            raise ValueError(f"Unsupported wire format {wire_format}")
+        if mineflayer and standby_processes > 0:
+            raise ValueError("Standby processes need a mineflayer of their own")
         if not mc_port and not azure_login:
             raise ValueError("Either mc_port or azure_login must be specified")
         if mc_port and azure_login:
@@ -35,11 +116,36 @@ class VoyagerEnv(gym.Env):
             )
         self.mc_port = mc_port
         self.azure_login = azure_login
+        self.server_host = server_host
         self.server = f"{server_host}:{server_port}"
         self.server_port = server_port
         self.request_timeout = request_timeout
         self.log_path = log_path
-        self.mineflayer = self.get_mineflayer_process(server_port)
+        # observations are encoded once by mineflayer in the negotiated format,
+        # gzip only pays off when mineflayer runs on a remote host
+        self.request_headers = {
+            "Accept": f"application/{wire_format}",
+            "Accept-Encoding": "gzip" if compress else "identity",
+        }
+        # keep-alive connections to mineflayer instead of one per request
+        self.session = requests.Session()
+        self.session.headers.update(self.request_headers)
+        # a shared mineflayer hosts other bots too, it is never restarted
+        # for a reset of this bot and only stopped by its owner
+        self.owns_mineflayer = mineflayer is None
+        if self.owns_mineflayer:
+            mineflayer = self.get_mineflayer_process(server_port)
+        self.mineflayer = mineflayer
+        # already started mineflayer servers to switch to on crash or hard reset
+        if standby_processes > 0:
+            if standby_base_port is None:
+                standby_base_port = server_port + 100
+            self.pool = ProcessPool(
+                make_process=self.get_mineflayer_process,
+                ports=[standby_base_port + i for i in range(standby_processes)],
+            )
+        else:
+            self.pool = None
         if azure_login:
             self.mc_instance = self.get_mc_instance()
         else:
@@ -47,24 +153,52 @@ class VoyagerEnv(gym.Env):
         self.has_reset = False
         self.reset_options = None
         self.connected = False
+        # set once the bot has spawned after the first reset
+        self.ready = threading.Event()
         self.server_paused = False
+        # content hashes of the programs registered in the mineflayer process
+        self.program_hashes = set()
+        # final observations of steps are sent as diffs against the last one
+        self.delta_observations = delta_observations
+        self.observation = {}
+        self.observation_seq = None
+        # no prismarine-viewer for the bot, attach_viewer adds one on demand
+        self.headless = headless
 
     def get_mineflayer_process(self, server_port):
-        log_dir = U.f_join(self.log_path, f"mineflayer_{self.bot_username}")
-        U.f_mkdir(self.log_path, log_dir)
-        file_path = os.path.abspath(os.path.dirname(__file__))
-        return SubprocessMonitor(
-            commands=[
-                "node",
-                U.f_join(file_path, "mineflayer/index.js"),
-                str(server_port),
-            ],
-            name=f"mineflayer_{self.bot_username}",
-            ready_match=r"Server started on port (\d+)",
-            log_path=log_dir,
+        return get_mineflayer_process(
+            server_port,
+            f"mineflayer_{self.bot_username}",
+            log_path=self.log_path,
+            server_host=self.server_host,
         )
 
+    def switch_to_standby(self):
+        self.mineflayer.stop()
+        standby = self.pool.acquire()
+        if standby is None:
+            print(
+                f"No standby mineflayer ready for {self.bot_username}, "
+                f"starting one on port {self.server_port}"
+            )
+            self.mineflayer.run()
+            return
+        port, self.mineflayer = standby
+        if self.mc_instance:
+            self.mc_instance.mineflayer = self.mineflayer
+        # warm a replacement on the port that was just freed
+        self.pool.release(self.server_port)
+        print(
+            f"Switched mineflayer for {self.bot_username} from port "
+            f"{self.server_port} to standby port {port}"
+        )
+        self.server_port = port
+        self.server = f"{self.server_host}:{port}"
+        self.reset_options["server_port"] = port
+
     def get_mc_instance(self):
+        from .minecraft_launcher import MinecraftInstance
+
         print(f"Creating Minecraft server for {self.bot_username}")
         log_dir = U.f_join(self.log_path, f"minecraft_{self.bot_username}")
         U.f_mkdir(self.log_path, log_dir)
@@ -74,7 +208,11 @@ class VoyagerEnv(gym.Env):
             log_path=log_dir,
         )
 
-    def check_process(self):
+    def restart_process(self):
+        """
+        Start minecraft and mineflayer again if they exited. Returns True
+        when mineflayer was restarted and the bot has to be started.
+        """
         if self.mc_instance and not self.mc_instance.is_running:
             print(f"Starting Minecraft server for {self.bot_username}")
             self.mc_instance.run()
@@ -84,63 +222,283 @@ class VoyagerEnv(gym.Env):
         retry = 0
         while not self.mineflayer.is_running:
             print(f"Mineflayer process has exited for {self.bot_username}, restarting")
-            self.mineflayer.run()
+            self.program_hashes.clear()
+            if self.pool:
+                self.switch_to_standby()
+            else:
+                self.mineflayer.run()
             if not self.mineflayer.is_running:
                 if retry > 3:
                     raise RuntimeError(f"Mineflayer process failed to start for {self.bot_username}")
                 else:
+                    retry += 1
                     continue
-            print(self.mineflayer.ready_line)
-            res = requests.post(
-                f"{self.server}/start",
-                json=self.reset_options,
+            print(f"Mineflayer server ready on port {self.server_port} for {self.bot_username}")
+            return True
+        return False
+
+    def check_process(self):
+        if self.restart_process():
+            return self.start_bot()
+
+    def start_process(self):
+        """
+        Start mineflayer ahead of the first reset, e.g. while the agents are
+        being set up. A shared mineflayer is only started once.
+        """
+        if not self.mineflayer.is_running:
+            self.mineflayer.run()
+
+    def start_bot(self):
+        res = self.session.post(
+            f"{self.server}/start",
+            json=self.reset_options,
+            timeout=self.request_timeout,
+        )
+        if res.status_code != 200:
+            self.start_failed(res.status_code)
+        return self.decode_response(res)
+
+    def start_failed(self, status_code):
+        if self.owns_mineflayer:
+            self.mineflayer.stop()
+        raise RuntimeError(
+            f"Minecraft server reply with code {status_code} for {self.bot_username}"
+        )
+
+    def decode_response(self, res):
+        return self.decode_body(res.headers.get("Content-Type", ""), res.content)
+
+    def decode_body(self, content_type, content):
+        if content_type.startswith("application/msgpack"):
+            import msgpack
+
+            return msgpack.unpackb(content, raw=False)
+        return json.loads(content)
+
+    def get_program_payload(self, programs: List[str]):
+        hashes = []
+        new_programs = []
+        for program in programs:
+            program_hash = hashlib.sha256(program.encode("utf-8")).hexdigest()
+            hashes.append(program_hash)
+            if program_hash not in self.program_hashes:
+                new_programs.append(program)
+        return {"programHashes": hashes, "newPrograms": new_programs}
+
+    def get_observer_payload(self, observer_options):
+        unknown = set(observer_options) - set(OBSERVER_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unsupported observer options {sorted(unknown)}")
+        return {
+            OBSERVER_OPTIONS[key]: value
+            for key, value in observer_options.items()
+            if value is not None
+        }
+
+    def get_step_data(
+        self,
+        code,
+        programs,
+        budget_s=None,
+        goal=None,
+        observers=None,
+        observer_options=None,
+    ):
+        # a list of programs goes through the mineflayer program registry,
+        # only programs it has not compiled yet are uploaded
+        data = {"code": code, "username": self.bot_username}
+        if budget_s:
+            data["budget"] = budget_s
+        if goal:
+            data["goal"] = goal
+        if observers is not None:
+            data["observers"] = observers
+        if observer_options:
+            data.update(self.get_observer_payload(observer_options))
+        if self.delta_observations:
+            data["delta"] = True
+            data["deltaBase"] = self.observation_seq
+        if isinstance(programs, str):
+            data["programs"] = programs
+        else:
+            data.update(self.get_program_payload(programs))
+        return data
+
+    # The decisions on step replies, reset and shutdown below are shared
+    # with AsyncVoyagerEnv, which wraps a VoyagerEnv and only sends the
+    # requests differently
+
+    def check_reset(self):
+        if not self.has_reset:
+            raise RuntimeError("Environment has not been reset yet")
+
+    def bot_lost(self, status):
+        """
+        True when the step has to be retried after starting the bot again,
+        the shared mineflayer was restarted for another bot.
+        """
+        return status == 404 and not self.owns_mineflayer
+
+    def programs_lost(self, status, data, programs):
+        """
+        True when the step has to be retried with all programs, mineflayer
+        lost its registry. Adds them to data.
+        """
+        if status != 409:
+            return False
+        self.program_hashes.clear()
+        data.update(self.get_program_payload(programs))
+        return True
+
+    def step_done(self, status, data, programs):
+        if status != 200:
+            raise RuntimeError(f"Failed to step Minecraft server for {self.bot_username}")
+        if not isinstance(programs, str):
+            self.program_hashes.update(data["programHashes"])
+
+    def post_step(self, data, programs, stream=False):
+        def post():
+            return self.session.post(
+                f"{self.server}/step",
+                json=data,
+                stream=stream,
                 timeout=self.request_timeout,
             )
-            if res.status_code != 200:
-                self.mineflayer.stop()
-                raise RuntimeError(
-                    f"Minecraft server reply with code {res.status_code} for {self.bot_username}"
-                )
-            return res.json()
+
+        res = post()
+        if self.bot_lost(res.status_code):
+            self.start_bot()
+            res = post()
+        if self.programs_lost(res.status_code, data, programs):
+            res = post()
+        self.step_done(res.status_code, data, programs)
+        return res
+
+    def voxel_grid(self, events):
+        """
+        NumPy view of the voxelGrid observation of the final event, None
+        when the step did not ask for the voxelGrid observer.
+        """
+        from .voxel_grid import VoxelGrid
+
+        observation = events[-1][1].get("voxelGrid")
+        return VoxelGrid(observation) if observation else None
+
+    def rebuild_event(self, event):
+        """
+        Turn a delta encoded final observation back into the full one.
+        """
+        event_type, observation = event
+        seq = observation.pop("deltaSeq", None)
+        if seq is None:
+            return event
+        if observation.pop("deltaBase", None) is None:
+            self.observation = {}
+        for key, value in observation.items():
+            observation[key] = apply_delta(self.observation.get(key), value)
+            self.observation[key] = observation[key]
+        self.observation_seq = seq
+        return event
 
     def step(
         self,
         code: str,
-        programs: str = "",
+        programs: Union[str, List[str]] = "",
+        stream: bool = False,
+        budget_s: float = None,
+        goal: Dict[str, Any] = None,
+        observers: List[str] = None,
+        observer_options: Dict[str, Any] = None,
     ) -> Tuple[ObsType, SupportsFloat, bool, bool, Dict[str, Any]]:
-        if not self.has_reset:
-            raise RuntimeError("Environment has not been reset yet")
+        """
+        budget_s cancels the code after that many seconds, the step then
+        returns the observation up to the cancellation. A goal from
+        CurriculumAgent.get_task_goal ends the step once it is met and sets
+        goalReached in the final observation. observers limits the
+        observation to these observers besides the on* events.
+        observer_options sets voxel_radius, entity_radius or chest_radius
+        for this step only, the reset options stay the defaults.
+        """
+        if stream:
+            return self.stream_step(
+                code,
+                programs,
+                budget_s=budget_s,
+                goal=goal,
+                observers=observers,
+                observer_options=observer_options,
+            )
+        self.check_reset()
         self.check_process()
-        
-        data = {
-            "code": code,
-            "programs": programs,
-        }
-        res = requests.post(
-            f"{self.server}/step", json=data, timeout=self.request_timeout
+
+        data = self.get_step_data(
+            code, programs, budget_s, goal, observers, observer_options
         )
-        if res.status_code != 200:
-            raise RuntimeError(f"Failed to step Minecraft server for {self.bot_username}")
-        returned_data = res.json()
-        
-        return json.loads(returned_data)
+        res = self.post_step(data, programs)
+        events = self.decode_response(res)
+        if events:
+            self.rebuild_event(events[-1])
+        return events
+
+    def stream_step(
+        self,
+        code: str,
+        programs: Union[str, List[str]] = "",
+        budget_s: float = None,
+        goal: Dict[str, Any] = None,
+        observers: List[str] = None,
+        observer_options: Dict[str, Any] = None,
+    ):
+        """
+        Run a step and yield its events while the code runs, the last one is
+        the final observe event.
+        """
+        self.check_reset()
+        self.check_process()
+
+        data = self.get_step_data(
+            code, programs, budget_s, goal, observers, observer_options
+        )
+        data["stream"] = True
+        with self.post_step(data, programs, stream=True) as res:
+            for line in res.iter_lines():
+                if line:
+                    yield self.rebuild_event(json.loads(line))
+
+    def cancel(self, reason=None):
+        """
+        Cancel the running step from another thread. Returns True when a
+        step was running.
+        """
+        try:
+            res = self.session.post(
+                f"{self.server}/cancel",
+                json=self.cancel_payload(reason),
+                timeout=self.request_timeout,
+            )
+        except requests.exceptions.RequestException:
+            return False
+        return res.status_code == 200
+
+    def bot_payload(self, **options):
+        return {"username": self.bot_username, **options}
+
+    def cancel_payload(self, reason):
+        if reason:
+            return self.bot_payload(reason=reason)
+        return self.bot_payload()
 
     def render(self):
         raise NotImplementedError("render is not implemented")
 
-    def reset(
-        self,
-        *,
-        seed=None,
-        options=None,
-    ) -> Tuple[ObsType, Dict[str, Any]]:
+    def get_reset_options(self, options):
         if options is None:
             options = {}
 
-        if options.get("inventory", {}) and options.get("mode", "hard") != "hard":
-            raise RuntimeError("inventory can only be set when options is hard")
-
-        self.reset_options = {
+        # inventory, time and difficulty are set by mineflayer in the same
+        # call, time "next" moves on to the next time of the day cycle
+        return {
             "port": self.mc_port,
             "reset": options.get("mode", "hard"),
             "inventory": options.get("inventory", {}),
@@ -148,51 +506,155 @@ class VoyagerEnv(gym.Env):
             "spread": options.get("spread", False),
             "waitTicks": options.get("wait_ticks", 5),
             "position": options.get("position", None),
+            "voxelRadius": options.get("voxel_radius", [8, 2, 8]),
+            "entityRadius": options.get("entity_radius", 32),
+            "chestRadius": options.get("chest_radius", 16),
+            "observers": options.get("observers", None),
+            "time": options.get("time", None),
+            "difficulty": options.get("difficulty", None),
             "username": self.bot_username,
-            "server_port": self.server_port
+            "server_port": self.server_port,
+            "headless": self.headless,
         }
 
-        # Remove pause/unpause calls here as well
+    def wants_soft_reset(self):
+        return self.reset_options["reset"] == "soft" and self.connected
+
+    def can_soft_reset(self):
+        if not self.mineflayer.is_running:
+            return False
+        return not (self.mc_instance and not self.mc_instance.is_running)
+
+    def stop_for_hard_reset(self):
+        """
+        Stop an own mineflayer that hosted the bot before starting it again.
+        A shared mineflayer is kept for the other bots and one started ahead
+        by start_process has not hosted the bot yet.
+        """
+        if not self.owns_mineflayer or not self.connected:
+            return
         self.mineflayer.stop()
-        time.sleep(1)  # wait for mineflayer to exit
+        self.program_hashes.clear()
+        if not self.pool:
+            time.sleep(1)  # wait for mineflayer to exit
 
-        returned_data = self.check_process()
+    def reset_done(self, returned_data):
         self.has_reset = True
         self.connected = True
+        self.ready.set()
         # All the reset in step will be soft
         self.reset_options["reset"] = "soft"
-        return json.loads(returned_data)
+        # the task setup is applied once, a later /start after a crash or a
+        # standby switch keeps what the bot has and where it is
+        self.reset_options.update(inventory={}, equipment=[], position=None, time=None)
+        return returned_data
+
+    def reset(
+        self,
+        *,
+        seed=None,
+        options=None,
+    ) -> Tuple[ObsType, Dict[str, Any]]:
+        self.reset_options = self.get_reset_options(options)
+
+        returned_data = None
+        if self.wants_soft_reset():
+            returned_data = self.soft_reset()
+        if returned_data is None:
+            self.stop_for_hard_reset()
+            returned_data = self.check_process()
+            if returned_data is None:
+                returned_data = self.start_bot()
+        return self.reset_done(returned_data)
+
+    def soft_reset(self):
+        """
+        Reset the observation state of the running bot without restarting
+        mineflayer. Returns None when the process or the bot is gone.
+        """
+        if not self.can_soft_reset():
+            return None
+        try:
+            res = self.session.post(
+                f"{self.server}/reset",
+                json=self.reset_options,
+                timeout=self.request_timeout,
+            )
+        except requests.exceptions.RequestException:
+            return None
+        if res.status_code != 200:
+            return None
+        return self.decode_response(res)
+
+    def attach_viewer(self):
+        """
+        Start a prismarine-viewer for the running bot. Returns its port, None
+        when the bot is not running.
+        """
+        try:
+            res = self.session.post(
+                f"{self.server}/viewer",
+                json=self.bot_payload(),
+                timeout=self.request_timeout,
+            )
+        except requests.exceptions.RequestException:
+            return None
+        if res.status_code != 200:
+            return None
+        return res.json()["port"]
+
+    def detach_viewer(self):
+        try:
+            res = self.session.post(
+                f"{self.server}/viewer",
+                json=self.bot_payload(close=True),
+                timeout=self.request_timeout,
+            )
+        except requests.exceptions.RequestException:
+            return False
+        return res.status_code == 200
+
+    def stop_processes(self):
+        if self.mc_instance:
+            self.mc_instance.stop()
+        if self.owns_mineflayer:
+            self.mineflayer.stop()
+        if self.pool:
+            self.pool.close()
 
     def close(self):
         self.unpause()
         if self.connected:
             try:
-                res = requests.post(f"{self.server}/stop")
+                res = self.session.post(
+                    f"{self.server}/stop", json=self.bot_payload()
+                )
                 if res.status_code == 200:
                     self.connected = False
             except:
                 pass
-        if self.mc_instance:
-            self.mc_instance.stop()
-        self.mineflayer.stop()
+        self.stop_processes()
+        self.session.close()
         return not self.connected
 
-    def pause(self):
-        if self.mineflayer.is_running and not self.server_paused:
+    def wants_pause_toggle(self, paused):
+        return self.mineflayer.is_running and self.server_paused != paused
+
+    def set_paused(self, paused):
+        # /pause toggles the pause state of the bot
+        if self.wants_pause_toggle(paused):
             try:
-                res = requests.post(f"{self.server}/pause")
+                res = self.session.post(
+                    f"{self.server}/pause", json=self.bot_payload()
+                )
                 if res.status_code == 200:
-                    self.server_paused = True
+                    self.server_paused = paused
             except:
                 pass
         return self.server_paused
 
+    def pause(self):
+        return self.set_paused(True)
+
     def unpause(self):
-        if self.mineflayer.is_running and self.server_paused:
-            try:
-                res = requests.post(f"{self.server}/pause")
-                if res.status_code == 200:
-                    self.server_paused = False
-            except:
-                pass
-        return self.server_paused
\ No newline at end of file
+        return self.set_paused(False)
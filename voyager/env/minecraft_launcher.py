@@ -25,11 +25,13 @@ class MinecraftInstance:
         self.log_path = log_path
         self.mc_dir = minecraft_launcher_lib.utils.get_minecraft_directory()
         self.port = None
+        # replaced by the env when it switches to a standby mineflayer
+        self.mineflayer = mineflayer
 
         def stop_mineflayer():
             print("Stopping mineflayer")
             try:
-                mineflayer.stop()
+                self.mineflayer.stop()
             except Exception as e:
                 print(e)
 
@@ -1,22 +1,192 @@
 const fs = require("fs");
+const { AsyncLocalStorage } = require("async_hooks");
 const express = require("express");
 const bodyParser = require("body-parser");
 const mineflayer = require("mineflayer");
-const { mineflayer: mineflayerViewer } = require('prismarine-viewer')
 const skills = require("./lib/skillLoader");
+const blockIndex = require("./lib/blockIndex");
+const entityIndex = require("./lib/entityIndex");
 const { initCounter, getNextTime } = require("./lib/utils");
 const obs = require("./lib/observation/base");
 const OnChat = require("./lib/observation/onChat");
 const OnError = require("./lib/observation/onError");
-const { Voxels, BlockRecords } = require("./lib/observation/voxels");
+const {
+    Voxels,
+    VoxelGrid,
+    BlockRecords,
+} = require("./lib/observation/voxels");
 const Status = require("./lib/observation/status");
 const Inventory = require("./lib/observation/inventory");
 const OnSave = require("./lib/observation/onSave");
 const Chests = require("./lib/observation/chests");
 const { plugin: tool } = require("mineflayer-tool");
-
-let bot = null;
+// required up front so a standby server is warm before its first /start
+const { pathfinder } = require("mineflayer-pathfinder");
+const collectBlock = require("mineflayer-collectblock").plugin;
+const pvp = require("mineflayer-pvp").plugin;
+const { ProgramRegistry } = require("./lib/programRegistry");
+const { GoalMonitor } = require("./lib/goalMonitor");
+const { settle } = require("./lib/settle");
+const { DeltaEncoder } = require("./lib/delta");
+const { StepScope } = require("./lib/stepScope");
+const wire = require("./lib/wire");
+
+// bots hosted by this process keyed by username, they share the program
+// registry and the loaded minecraft-data, pathfinder and viewer modules
+const bots = new Map();
+const programRegistry = new ProgramRegistry();
 const viewerPorts = new Map();
+// the step whose program code is running, program callbacks keep it too
+const stepContext = new AsyncLocalStorage();
+// the username of the bot whose connection, plugins or handlers run
+const botContext = new AsyncLocalStorage();
+const runningSteps = new Set();
+
+// An uncaught error fails only the step whose code raised it. Errors from
+// program code left over after its step ended are only logged: an exit here
+// would take down every bot of the process.
+function reportError(step, err) {
+    if (step && !step.done) {
+        step.onError(err);
+    } else {
+        console.error("Uncaught error outside a running step:", err);
+    }
+}
+
+// Errors raised outside of program code, e.g. by a physicTick or
+// pathfinder handler or mineflayer itself, fail the running steps of the
+// bot they came from, or every running step when that is not known.
+function onUncaughtError(err) {
+    const step = stepContext.getStore();
+    if (step) {
+        reportError(step, err);
+        return;
+    }
+    const username = botContext.getStore();
+    const steps = Array.from(runningSteps).filter(
+        (running) => !username || running.username === username
+    );
+    if (!steps.length) {
+        console.error("Uncaught error outside a running step:", err);
+    }
+    steps.forEach((running) => reportError(running, err));
+}
+process.on("uncaughtException", onUncaughtError);
+process.on("unhandledRejection", onUncaughtError);
+
+function getBot(req) {
+    const username = req.body.username || req.query.username;
+    if (username) return bots.get(username) || null;
+    // a single bot can still be addressed without its username
+    return bots.size === 1 ? bots.values().next().value : null;
+}
+
+function stopBot(bot, message) {
+    const username = bot.username;
+    if (bots.get(username) === bot) {
+        detachViewer(bot);
+        bots.delete(username);
+    }
+    bot.end();
+    console.log(`Bot ${username} disconnected:`, message);
+}
+
+const equipmentNames = [
+    "armor.head",
+    "armor.chest",
+    "armor.legs",
+    "armor.feet",
+    "weapon.mainhand",
+    "weapon.offhand",
+];
+
+// Send the whole task setup of a reset as one batch of commands, the server
+// runs them in order and a single settle waits for all of them. Returns the
+// number of item commands, they bound the wait.
+function sendResetCommands(bot, body) {
+    const inventory = body.inventory || {};
+    const equipment = body.equipment || [null, null, null, null, null, null];
+    const commands = [];
+    let itemCommands = 0;
+    if (body.reset === "hard") {
+        commands.push("/clear @s", "/kill @s");
+    } else if (Object.keys(inventory).length) {
+        commands.push("/clear @s");
+    }
+    if (body.reset === "hard" || Object.keys(inventory).length) {
+        for (let key in inventory) {
+            commands.push(`/give @s minecraft:${key} ${inventory[key]}`);
+            itemCommands += 1;
+        }
+        for (let i = 0; i < 6; i++) {
+            if (i === 4) continue;
+            if (equipment[i]) {
+                commands.push(
+                    `/item replace entity @s ${equipmentNames[i]} with minecraft:${equipment[i]}`
+                );
+                itemCommands += 1;
+            }
+        }
+    }
+    if (body.position) {
+        const { x, y, z } = body.position;
+        commands.push(`/tp @s ${x} ${y} ${z}`);
+    }
+    if (body.difficulty) {
+        commands.push(`/difficulty ${body.difficulty}`);
+    }
+    if (body.time === "next") {
+        if (!bot.gameTimeList) initCounter(bot);
+        commands.push(`/time set ${getNextTime(bot)}`);
+    } else if (body.time !== undefined && body.time !== null) {
+        commands.push(`/time set ${body.time}`);
+    }
+    commands.forEach((command) => bot.chat(command));
+    return itemCommands;
+}
+
+function hasIronPickaxe(bot) {
+    return !!bot.inventory
+        .items()
+        .find((item) => item.name === "iron_pickaxe");
+}
+
+// serverPort + 7 (3000 -> 3007) unless another bot here already uses it
+function getViewerPort(serverPort) {
+    const used = new Set(viewerPorts.values());
+    let viewerPort = serverPort + 7;
+    while (used.has(viewerPort)) viewerPort++;
+    return viewerPort;
+}
+
+// prismarine-viewer is only loaded once a bot is started with a viewer or
+// one is attached through /viewer, headless bots never pay for its meshing
+function attachViewer(bot) {
+    if (bot.viewer) return viewerPorts.get(bot.username);
+    const { mineflayer: mineflayerViewer } = require("prismarine-viewer");
+    const viewerPort = getViewerPort(bot.serverPort);
+    mineflayerViewer(bot, {
+        port: viewerPort,
+        firstPerson: true,
+        viewDistance: 6,
+    });
+    viewerPorts.set(bot.username, viewerPort);
+    console.log(
+        `First person view for ${bot.username} available at port ${viewerPort}`
+    );
+    return viewerPort;
+}
+
+function detachViewer(bot) {
+    if (!bot.viewer) return;
+    try {
+        bot.viewer.close();
+    } catch (err) {
+        console.error(`Error closing viewer for ${bot.username}:`, err);
+    }
+    delete bot.viewer;
+    viewerPorts.delete(bot.username);
+}
 
 const app = express();
 
@@ -24,32 +194,32 @@ app.use(bodyParser.json({ limit: "50mb" }));
 app.use(bodyParser.urlencoded({ limit: "50mb", extended: false }));
 
 app.post("/start", (req, res) => {
-    if (bot) onDisconnect("Restarting bot");
-    bot = null;
+    const username = req.body.username || "bot";
+    if (bots.has(username)) stopBot(bots.get(username), "Restarting bot");
     console.log(req.body);
 
-    // Calculate viewer port based on server port
-    const serverPort = parseInt(req.body.server_port);
-    const viewerPort = serverPort + 7; // e.g., 3000 -> 3007, 3001 -> 3008
-    viewerPorts.set(req.body.username, viewerPort);
-
-    bot = mineflayer.createBot({
-        host: "localhost",
-        port: req.body.port,
-        username: req.body.username || "bot",
-        disableChatSigning: true,
-        checkTimeoutInterval: 60 * 60 * 1000,
-    });
+    // the connection, timers and plugins of the bot keep its username
+    const bot = botContext.run(username, () =>
+        mineflayer.createBot({
+            host: "localhost",
+            port: req.body.port,
+            username,
+            disableChatSigning: true,
+            checkTimeoutInterval: 60 * 60 * 1000,
+        })
+    );
+    bots.set(username, bot);
     bot.once("error", onConnectionFailed);
 
     // Event subscriptions
     bot.waitTicks = req.body.waitTicks;
+    bot.serverPort = parseInt(req.body.server_port) || parseInt(PORT);
     bot.globalTickCounter = 0;
     bot.stuckTickCounter = 0;
     bot.stuckPosList = [];
     bot.iron_pickaxe = false;
 
-    bot.on("kicked", onDisconnect);
+    bot.on("kicked", (reason) => stopBot(bot, reason));
 
     // mounting will cause physicsTick to stop
     bot.on("mount", () => {
@@ -58,71 +228,24 @@ app.post("/start", (req, res) => {
 
     bot.once("spawn", async () => {
         bot.removeListener("error", onConnectionFailed);
-        let itemTicks = 1;
-        if (req.body.reset === "hard") {
-            bot.chat("/clear @s");
-            bot.chat("/kill @s");
-            const inventory = req.body.inventory ? req.body.inventory : {};
-            const equipment = req.body.equipment
-                ? req.body.equipment
-                : [null, null, null, null, null, null];
-            for (let key in inventory) {
-                bot.chat(`/give @s minecraft:${key} ${inventory[key]}`);
-                itemTicks += 1;
-            }
-            const equipmentNames = [
-                "armor.head",
-                "armor.chest",
-                "armor.legs",
-                "armor.feet",
-                "weapon.mainhand",
-                "weapon.offhand",
-            ];
-            for (let i = 0; i < 6; i++) {
-                if (i === 4) continue;
-                if (equipment[i]) {
-                    bot.chat(
-                        `/item replace entity @s ${equipmentNames[i]} with minecraft:${equipment[i]}`
-                    );
-                    itemTicks += 1;
-                }
-            }
-        }
-
-        if (req.body.position) {
-            bot.chat(
-                `/tp @s ${req.body.position.x} ${req.body.position.y} ${req.body.position.z}`
-            );
-        }
-
-        if (
-            bot.inventory.items().find((item) => item.name === "iron_pickaxe")
-        ) {
-            bot.iron_pickaxe = true;
-        }
-
-        const { pathfinder } = require("mineflayer-pathfinder");
-        const tool = require("mineflayer-tool").plugin;
-        const collectBlock = require("mineflayer-collectblock").plugin;
-        const pvp = require("mineflayer-pvp").plugin;
+        const itemTicks = 1 + sendResetCommands(bot, req.body);
 
         bot.loadPlugin(pathfinder);
         bot.loadPlugin(tool);
         bot.loadPlugin(collectBlock);
         bot.loadPlugin(pvp);
 
-        // Initialize viewer with dynamic port
-        try {
-            mineflayerViewer(bot, {
-                port: viewerPort,
-                firstPerson: true,
-                viewDistance: 6
-            });
-            console.log(`First person view for ${bot.username} available at port ${viewerPort}`);
-        } catch (err) {
-            console.error(`Failed to start viewer for ${bot.username}:`, err);
+        if (!req.body.headless) {
+            try {
+                attachViewer(bot);
+            } catch (err) {
+                console.error(
+                    `Failed to start viewer for ${bot.username}:`,
+                    err
+                );
+            }
         }
-        
+
         bot.collectBlock.movements.digCost = 0;
         bot.collectBlock.movements.placeCost = 0;
 
@@ -135,16 +258,22 @@ app.post("/start", (req, res) => {
             OnSave,
             Chests,
             BlockRecords,
+            VoxelGrid,
         ]);
+        bot.observeDefaults = obs.configure(bot, req.body);
         skills.inject(bot);
+        blockIndex.inject(bot);
+        entityIndex.inject(bot);
 
         if (req.body.spread) {
             bot.chat(`/spreadplayers ~ ~ 0 300 under 80 false @s`);
-            await bot.waitForTicks(bot.waitTicks);
+            await settle(bot, bot.waitTicks, { barrier: true });
         }
 
-        await bot.waitForTicks(bot.waitTicks * itemTicks);
-        res.json(bot.observe());
+        await settle(bot, bot.waitTicks * itemTicks, { barrier: true });
+        bot.iron_pickaxe = hasIronPickaxe(bot);
+        wire.send(req, res, bot.observe());
+        bot.obsFilter = null;
 
         initCounter(bot);
         bot.chat("/gamerule keepInventory true");
@@ -152,27 +281,46 @@ app.post("/start", (req, res) => {
     });
 
     function onConnectionFailed(e) {
-        console.log(`Connection failed for ${bot?.username || 'unknown bot'}:`, e);
-        bot = null;
+        console.log(`Connection failed for ${username}:`, e);
+        if (bots.get(username) === bot) bots.delete(username);
         res.status(400).json({ error: e });
     }
+});
 
-    function onDisconnect(message) {
-        if (bot) {
-            const username = bot.username;
-            if (bot.viewer) {
-                try {
-                    bot.viewer.close();
-                } catch (err) {
-                    console.error(`Error closing viewer for ${username}:`, err);
-                }
-            }
-            viewerPorts.delete(username);
-            bot.end();
-            console.log(`Bot ${username} disconnected:`, message);
-            bot = null;
-        }
+// Soft reset: keep the process and the connected bot, only reset the
+// observation state and the counters
+app.post("/reset", async (req, res) => {
+    const bot = getBot(req);
+    if (!bot || !bot.obsList) {
+        res.status(400).json({ error: "Bot not spawned" });
+        return;
+    }
+    if (req.body.reset === "hard") {
+        res.status(400).json({ error: "Hard reset requires /start" });
+        return;
+    }
+
+    bot.waitTicks = req.body.waitTicks;
+    bot.globalTickCounter = 0;
+    bot.stuckTickCounter = 0;
+    bot.stuckPosList = [];
+    bot.obsList.forEach((obs) => obs.reset());
+    bot.cumulativeObs = [];
+    bot.observeDefaults = obs.configure(bot, req.body);
+
+    const itemTicks = 1 + sendResetCommands(bot, req.body);
+
+    if (req.body.spread) {
+        bot.chat(`/spreadplayers ~ ~ 0 300 under 80 false @s`);
+        await settle(bot, bot.waitTicks, { barrier: true });
     }
+
+    await settle(bot, bot.waitTicks * itemTicks, { barrier: true });
+    bot.iron_pickaxe = hasIronPickaxe(bot);
+    wire.send(req, res, bot.observe());
+    bot.obsFilter = null;
+
+    initCounter(bot);
 });
 
 // Rest of the code remains the same as in original index.js...
@@ -180,19 +328,59 @@ app.post("/start", (req, res) => {
 
 
 app.post("/step", async (req, res) => {
+    const bot = getBot(req);
+    if (!bot || !bot.obsList) {
+        res.status(404).json({ error: "Bot not spawned" });
+        return;
+    }
+    const code = req.body.code;
+    const programs = req.body.programs || "";
+    const programHashes = req.body.programHashes || [];
+    (req.body.newPrograms || []).forEach((source) =>
+        programRegistry.register(source)
+    );
+    const missing = programRegistry.missing(programHashes);
+    if (missing.length) {
+        res.status(409).json({ error: "Unknown programs", missing });
+        return;
+    }
+
+    // observers and radii of this step, the defaults are restored once the
+    // final observation is sent
+    obs.configure(bot, req.body, bot.observeDefaults);
+
     let response_sent = false;
+    let stream = null;
+    const ticksWaited = { before: 0, after: 0 };
     function otherError(err) {
-        console.log(`Uncaught Error for ${bot?.username || 'unknown'}:`);
+        console.log(`Uncaught Error for ${bot.username}:`);
         bot.emit("error", handleError(err));
-        bot.waitForTicks(bot.waitTicks).then(() => {
-            if (!response_sent) {
-                response_sent = true;
-                res.json(bot.observe());
-            }
-        });
+        bot.waitForTicks(bot.waitTicks).then(respond);
+    }
+
+    function respond() {
+        if (response_sent) return;
+        response_sent = true;
+        const events = bot.observe();
+        obs.configure(bot, {}, bot.observeDefaults);
+        const final = events[events.length - 1][1];
+        final.ticksWaited = ticksWaited;
+        if (goalReached) final.goalReached = true;
+        if (req.body.delta) {
+            if (!bot.deltaEncoder) bot.deltaEncoder = new DeltaEncoder();
+            events[events.length - 1][1] = bot.deltaEncoder.encode(
+                final,
+                req.body.deltaBase
+            );
+        }
+        if (stream) {
+            bot.eventSink = null;
+            stream.end(events);
+        } else {
+            wire.send(req, res, events);
+        }
     }
 
-    process.on("uncaughtException", otherError);
 
     const mcData = require("minecraft-data")(bot.version);
     mcData.itemsByName["leather_cap"] = mcData.itemsByName["leather_helmet"];
@@ -245,44 +433,137 @@ app.post("/step", async (req, res) => {
 
     bot.on("physicTick", onTick);
 
-    // initialize fail count
-    let _craftItemFailCount = 0;
-    let _killMobFailCount = 0;
-    let _mineBlockFailCount = 0;
-    let _placeItemFailCount = 0;
-    let _smeltItemFailCount = 0;
+    // the timers and bot listeners of the programs are cleared once the
+    // step ends, a cancelled program left running can't reach into the next
+    // step and its callbacks no longer fire
+    const step = { username: bot.username, done: false, onError: otherError };
+    runningSteps.add(step);
+    const stepScope = new StepScope(bot, (err) => reportError(step, err));
+    let finish;
+    const finished = new Promise((resolve) => {
+        finish = (result) => {
+            if (step.done) return;
+            step.done = true;
+            runningSteps.delete(step);
+            resolve(result);
+            stepScope.dispose(
+                result instanceof Error ? result.message : "Task goal reached"
+            );
+            try {
+                stopActions();
+            } catch (err) {
+                console.error(`Error stopping ${bot.username}:`, err);
+            }
+        };
+    });
+    bot.cancelStep = (reason) => finish(new Error(reason));
+    let budgetTimeout = null;
+    if (req.body.budget) {
+        budgetTimeout = setTimeout(
+            () =>
+                bot.cancelStep(
+                    `Code exceeded the time budget of ${req.body.budget}s`
+                ),
+            req.body.budget * 1000
+        );
+    }
+    // end the step as soon as the task goal is met
+    let goalReached = false;
+    const goalMonitor = req.body.goal
+        ? new GoalMonitor(bot, req.body.goal, () => {
+              goalReached = true;
+              finish("success");
+          })
+        : null;
+
+    // everything the programs can see besides their own functions,
+    // fail counts are initialized here for every step
+    const scope = {
+        ...stepScope.globals(),
+        bot: stepScope.bot,
+        mcData,
+        Vec3,
+        Movements,
+        pathfinder,
+        Goal,
+        GoalBlock,
+        GoalNear,
+        GoalXZ,
+        GoalNearXZ,
+        GoalY,
+        GoalGetToBlock,
+        GoalLookAtBlock,
+        GoalBreakBlock,
+        GoalCompositeAny,
+        GoalCompositeAll,
+        GoalInvert,
+        GoalFollow,
+        GoalPlaceBlock,
+        getNextTime: () => getNextTime(bot),
+        _craftItemFailCount: 0,
+        _killMobFailCount: 0,
+        _mineBlockFailCount: 0,
+        _placeItemFailCount: 0,
+        _smeltItemFailCount: 0,
+    };
+    programRegistry.link(programHashes, scope);
 
-    const code = req.body.code;
-    const programs = req.body.programs;
     bot.cumulativeObs = [];
+    // stream the events as they happen instead of one reply at the end
+    if (req.body.stream) {
+        stream = wire.openStream(res);
+        bot.eventSink = (events) => stream.write(events);
+    }
     
-    await bot.waitForTicks(bot.waitTicks);
-    const r = await evaluateCode(code, programs);
-    process.off("uncaughtException", otherError);
+    // waitTicks only bounds the waits, they end once the bot has settled
+    ticksWaited.before = await settle(bot, bot.waitTicks);
+    // a cancel during the settle ends the step before its code starts
+    const r = step.done
+        ? await finished
+        : await Promise.race([
+              stepContext.run(step, () => evaluateCode(code, programs)),
+              finished,
+          ]);
+    step.done = true;
+    runningSteps.delete(step);
+    stepScope.dispose();
+    clearTimeout(budgetTimeout);
+    if (goalMonitor) goalMonitor.stop();
+    bot.cancelStep = null;
     
     if (r !== "success") {
         bot.emit("error", handleError(r));
     }
     
     await returnItems();
-    await bot.waitForTicks(bot.waitTicks);
-    
-    if (!response_sent) {
-        response_sent = true;
-        res.json(bot.observe());
-    }
+    ticksWaited.after = await settle(bot, bot.waitTicks, { barrier: true });
+    respond();
     
     bot.removeListener("physicTick", onTick);
 
     async function evaluateCode(code, programs) {
         try {
-            await eval("(async () => {" + programs + "\n" + code + "})()");
+            await eval(
+                "with (scope) { (async () => {" +
+                    programs +
+                    "\n" +
+                    code +
+                    "})() }"
+            );
             return "success";
         } catch (err) {
             return err;
         }
     }
 
+    function stopActions() {
+        bot.pathfinder.setGoal(null);
+        bot.pvp.stop();
+        bot.collectBlock.cancelTask().catch(() => {});
+        bot.stopDigging();
+        bot.clearControlStates();
+    }
+
     function onStuck(posThreshold) {
         const currentPos = bot.entity.position;
         bot.stuckPosList.push(currentPos);
@@ -378,6 +659,25 @@ app.post("/step", async (req, res) => {
         let f_line = final_line.match(
             /\((?<file>.*):(?<line>\d+):(?<pos>\d+)\)/
         );
+        if (f_line && f_line.groups) {
+            const programLine = programRegistry.sourceLine(
+                f_line.groups.file,
+                parseInt(f_line.groups.line)
+            );
+            if (programLine !== null) {
+                const code_source = `at line ${match_line}:${code
+                    .split("\n")
+                    [match_line - 1].trim()} in your code`;
+                return (
+                    "In your program code: " +
+                    programLine +
+                    "\n" +
+                    err.message +
+                    "\n" +
+                    code_source
+                );
+            }
+        }
         if (f_line && f_line.groups && fs.existsSync(f_line.groups.file)) {
             const { file, line, pos } = f_line.groups;
             const f = fs.readFileSync(file, "utf8").split("\n");
@@ -402,9 +702,50 @@ app.post("/step", async (req, res) => {
     }
 });
 
+app.get("/health", (req, res) => {
+    res.json({
+        status: "ok",
+        pid: process.pid,
+        bots: Array.from(bots.keys()),
+    });
+});
+
+// Abort the running step of a bot, the step still returns the items and
+// replies with the observation up to this point
+app.post("/cancel", (req, res) => {
+    const bot = getBot(req);
+    if (!bot || !bot.cancelStep) {
+        res.status(400).json({ error: "No step running" });
+        return;
+    }
+    bot.cancelStep(req.body.reason || "Code was cancelled");
+    res.json({ message: "Success" });
+});
+
+// Attach a viewer to a running bot, or close it with close: true. Replies
+// with the viewer port, null once closed
+app.post("/viewer", (req, res) => {
+    const bot = getBot(req);
+    if (!bot || !bot.entity) {
+        res.status(400).json({ error: "Bot not spawned" });
+        return;
+    }
+    if (req.body.close) {
+        detachViewer(bot);
+        res.json({ port: null });
+        return;
+    }
+    try {
+        res.json({ port: attachViewer(bot) });
+    } catch (err) {
+        res.status(500).json({ error: err.message });
+    }
+});
+
 app.post("/stop", (req, res) => {
+    const bot = getBot(req);
     if (bot) {
-        bot.end();
+        stopBot(bot, "Stopped");
         res.json({
             message: `Bot ${bot.username} stopped`,
         });
@@ -416,6 +757,7 @@ app.post("/stop", (req, res) => {
 });
 
 app.post("/pause", (req, res) => {
+    const bot = getBot(req);
     if (!bot) {
         res.status(400).json({ error: "Bot not spawned" });
         return;
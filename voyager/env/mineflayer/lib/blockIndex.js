@@ -0,0 +1,191 @@
+const { Vec3 } = require("vec3");
+
+// Only sparse blocks are indexed, an entry per block of stone or dirt would
+// cost hundreds of megabytes per bot
+const SPARSE_BLOCKS =
+    /^(?:chest|trapped_chest|ender_chest|barrel|crafting_table|furnace|blast_furnace|smoker|anvil|enchanting_table|brewing_stand|spawner|ancient_debris|.*_ore)$/;
+
+// State ids a section may hold, null when it has to be scanned: before 1.18
+// the palette is on the section, since 1.18 on its data container, which
+// holds a single value when the whole section is one block
+function sectionPalette(section) {
+    if (Array.isArray(section.palette)) return section.palette;
+    const data = section.data;
+    if (!data) return null;
+    if (Array.isArray(data.palette)) return data.palette;
+    if (data.value !== undefined) return [data.value];
+    return null;
+}
+
+// Positions of the queried sparse block types over the loaded world,
+// grouped by chunk section. A type is indexed the first time it is searched
+// for and is then kept up to date from blockUpdate and chunk events, so
+// findBlock and findBlocks for chests, ores and the like become lookups
+// instead of world scans.
+class BlockIndex {
+    constructor(bot) {
+        this.bot = bot;
+        // type id -> section key -> position key -> Vec3
+        this.types = new Map();
+        bot.on("blockUpdate", (oldBlock, newBlock) => {
+            if (oldBlock) this.remove(oldBlock.type, oldBlock.position);
+            if (newBlock) this.add(newBlock.type, newBlock.position);
+        });
+        bot.on("chunkColumnLoad", (point) => {
+            this.unloadColumn(point);
+            this.types.forEach((sections, type) =>
+                this.scanColumn(type, point)
+            );
+        });
+        bot.on("chunkColumnUnload", (point) => this.unloadColumn(point));
+    }
+
+    sectionKey(position) {
+        return `${position.x >> 4},${position.y >> 4},${position.z >> 4}`;
+    }
+
+    add(type, position) {
+        const sections = this.types.get(type);
+        if (!sections) return;
+        const key = this.sectionKey(position);
+        if (!sections.has(key)) sections.set(key, new Map());
+        sections.get(key).set(position.toString(), position.clone());
+    }
+
+    remove(type, position) {
+        const sections = this.types.get(type);
+        if (!sections) return;
+        const key = this.sectionKey(position);
+        const section = sections.get(key);
+        if (!section) return;
+        section.delete(position.toString());
+        if (section.size === 0) sections.delete(key);
+    }
+
+    unloadColumn(point) {
+        const prefix = `${point.x >> 4},`;
+        const suffix = `,${point.z >> 4}`;
+        this.types.forEach((sections) => {
+            for (const key of sections.keys()) {
+                if (key.startsWith(prefix) && key.endsWith(suffix)) {
+                    sections.delete(key);
+                }
+            }
+        });
+    }
+
+    // Scan the sections of a column that may hold the type, sections with a
+    // palette are skipped when the palette does not contain it
+    scanColumn(type, point) {
+        const column = this.bot.world.getColumnAt(point);
+        if (!column || !column.sections) return;
+        const block = this.bot.registry.blocks[type];
+        const matches = (stateId) =>
+            stateId >= block.minStateId && stateId <= block.maxStateId;
+        const minY = this.bot.game.minY || 0;
+        const baseX = (point.x >> 4) << 4;
+        const baseZ = (point.z >> 4) << 4;
+        const cursor = new Vec3(0, 0, 0);
+        column.sections.forEach((section, i) => {
+            if (!section) return;
+            const palette = sectionPalette(section);
+            if (palette && !palette.some(matches)) return;
+            const baseY = minY + i * 16;
+            for (let y = baseY; y < baseY + 16; y++) {
+                for (let z = 0; z < 16; z++) {
+                    for (let x = 0; x < 16; x++) {
+                        cursor.set(x, y, z);
+                        if (matches(column.getBlockStateId(cursor))) {
+                            this.add(type, new Vec3(baseX + x, y, baseZ + z));
+                        }
+                    }
+                }
+            }
+        });
+    }
+
+    track(type) {
+        if (this.types.has(type)) return;
+        this.types.set(type, new Map());
+        this.bot.world.getColumns().forEach(({ chunkX, chunkZ }) => {
+            this.scanColumn(
+                type,
+                new Vec3(parseInt(chunkX) * 16, 0, parseInt(chunkZ) * 16)
+            );
+        });
+    }
+
+    // Sections are visited nearest first, the search stops once count
+    // blocks are found and no later section can hold a nearer one
+    findBlocks(types, point, maxDistance, count) {
+        const halfDiagonal = 14; // of a 16x16x16 section
+        const sections = [];
+        types.forEach((type) => {
+            this.track(type);
+            this.types.get(type).forEach((section, key) => {
+                const [x, y, z] = key
+                    .split(",")
+                    .map((v) => parseInt(v) * 16 + 8);
+                const distance = point.distanceTo(new Vec3(x, y, z));
+                if (distance > maxDistance + halfDiagonal) return;
+                sections.push([distance - halfDiagonal, section]);
+            });
+        });
+        sections.sort((a, b) => a[0] - b[0]);
+        let found = [];
+        for (const [nearest, section] of sections) {
+            if (found.length >= count && nearest > found[count - 1][0]) break;
+            section.forEach((position) => {
+                const distance = point.distanceTo(position);
+                if (distance <= maxDistance) found.push([distance, position]);
+            });
+            found.sort((a, b) => a[0] - b[0]);
+            found = found.slice(0, count);
+        }
+        return found.map(([distance, position]) => position);
+    }
+}
+
+function indexedTypes(bot, matching) {
+    const types = Array.isArray(matching) ? matching : [matching];
+    if (
+        types.length &&
+        types.every(
+            (type) =>
+                typeof type === "number" &&
+                bot.registry.blocks[type] &&
+                SPARSE_BLOCKS.test(bot.registry.blocks[type].name)
+        )
+    ) {
+        return types;
+    }
+    return null;
+}
+
+// Serve searches for sparse block ids from the index, searches for other
+// blocks, by predicate or with extra block info still go through mineflayer
+function inject(bot) {
+    bot.blockIndex = new BlockIndex(bot);
+
+    bot._findBlocks = bot.findBlocks;
+    bot.findBlocks = (options) => {
+        const types = indexedTypes(bot, options.matching);
+        if (!types || options.useExtraInfo) return bot._findBlocks(options);
+        return bot.blockIndex.findBlocks(
+            types,
+            options.point || bot.entity.position,
+            options.maxDistance || 16,
+            options.count || 1
+        );
+    };
+
+    bot._findBlock = bot.findBlock;
+    bot.findBlock = (options) => {
+        const types = indexedTypes(bot, options.matching);
+        if (!types || options.useExtraInfo) return bot._findBlock(options);
+        const blocks = bot.findBlocks({ ...options, count: 1 });
+        return blocks.length ? bot.blockAt(blocks[0]) : null;
+    };
+}
+
+module.exports = { BlockIndex, inject };
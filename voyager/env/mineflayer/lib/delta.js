@@ -0,0 +1,82 @@
+// sequence numbers stay unique across bots and server restarts, a client
+// holding an observation from another encoder always gets a full one
+let lastSeq = Date.now();
+
+function describe(value) {
+    if (Array.isArray(value)) {
+        const items = new Map();
+        for (const item of value) {
+            if (item !== null && typeof item === "object") return null;
+            items.set(JSON.stringify(item), item);
+        }
+        // duplicates can't be expressed as added and removed items
+        return items.size === value.length ? { kind: "array", items } : null;
+    }
+    if (value !== null && typeof value === "object") {
+        const items = new Map();
+        for (const key in value) items.set(key, JSON.stringify(value[key]));
+        return { kind: "object", items };
+    }
+    return null;
+}
+
+function diff(previous, current, value) {
+    if (!previous || !current || previous.kind !== current.kind) return value;
+    if (current.kind === "object") {
+        const set = {};
+        current.items.forEach((json, key) => {
+            if (previous.items.get(key) !== json) set[key] = value[key];
+        });
+        const del = [];
+        previous.items.forEach((json, key) => {
+            if (!current.items.has(key)) del.push(key);
+        });
+        return { $set: set, $del: del };
+    }
+    const add = [];
+    current.items.forEach((item, json) => {
+        if (!previous.items.has(json)) add.push(item);
+    });
+    const del = [];
+    previous.items.forEach((item, json) => {
+        if (!current.items.has(json)) del.push(item);
+    });
+    return { $add: add, $del: del };
+}
+
+// Encodes the final observation of a step as diffs against the last one sent
+// to the client, per observer. Unchanged values become {$same}, objects
+// {$set, $del} and lists of names {$add, $del}. When the client does not
+// hold the last sent observation everything is sent in full.
+class DeltaEncoder {
+    constructor() {
+        this.seq = null;
+        this.sent = new Map();
+    }
+
+    encode(final, base) {
+        const full = base === undefined || base === null || base !== this.seq;
+        if (full) this.sent = new Map();
+        const encoded = {};
+        for (const key in final) {
+            const value = final[key];
+            const json = JSON.stringify(value);
+            const previous = this.sent.get(key);
+            const current = describe(value);
+            this.sent.set(key, { json, current });
+            if (!previous) {
+                encoded[key] = value;
+            } else if (previous.json === json) {
+                encoded[key] = { $same: true };
+            } else {
+                encoded[key] = diff(previous.current, current, value);
+            }
+        }
+        this.seq = ++lastSeq;
+        encoded.deltaSeq = this.seq;
+        if (!full) encoded.deltaBase = base;
+        return encoded;
+    }
+}
+
+module.exports = { DeltaEncoder };
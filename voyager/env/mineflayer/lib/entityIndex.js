@@ -0,0 +1,132 @@
+const CELL_SIZE = 16;
+
+function cellOf(position) {
+    return [
+        Math.floor(position.x / CELL_SIZE),
+        Math.floor(position.z / CELL_SIZE),
+    ];
+}
+
+// Entities grouped by 16x16 column cell, kept up to date from entitySpawn,
+// entityMoved and entityGone, so nearby entity queries only look at the cells
+// within reach instead of every entity the bot knows about.
+class EntityIndex {
+    constructor(bot) {
+        this.bot = bot;
+        // cell key -> entity id -> entity
+        this.cells = new Map();
+        // entity id -> cell key
+        this.keys = new Map();
+        // entity id -> callbacks waiting for the entity to go
+        this.goneWatchers = new Map();
+        bot.on("entitySpawn", (entity) => this.update(entity));
+        bot.on("entityMoved", (entity) => this.update(entity));
+        bot.on("entityGone", (entity) => this.remove(entity));
+        for (const id in bot.entities || {}) this.update(bot.entities[id]);
+    }
+
+    update(entity) {
+        if (!entity || !entity.position) return;
+        const key = cellOf(entity.position).join(",");
+        const previous = this.keys.get(entity.id);
+        if (previous === key) return;
+        if (previous !== undefined) this.cells.get(previous).delete(entity.id);
+        if (!this.cells.has(key)) this.cells.set(key, new Map());
+        this.cells.get(key).set(entity.id, entity);
+        this.keys.set(entity.id, key);
+    }
+
+    remove(entity) {
+        const key = this.keys.get(entity.id);
+        if (key !== undefined) {
+            const cell = this.cells.get(key);
+            cell.delete(entity.id);
+            if (cell.size === 0) this.cells.delete(key);
+            this.keys.delete(entity.id);
+        }
+        const watchers = this.goneWatchers.get(entity.id);
+        if (watchers) {
+            this.goneWatchers.delete(entity.id);
+            watchers.forEach((callback) => callback(entity));
+        }
+    }
+
+    // [distance, entity] pairs within maxDistance of point, the distance of
+    // each entity is computed once
+    within(point, maxDistance, filter = () => true) {
+        const found = [];
+        const [minX, minZ] = cellOf(
+            point.offset(-maxDistance, 0, -maxDistance)
+        );
+        const [maxX, maxZ] = cellOf(
+            point.offset(maxDistance, 0, maxDistance)
+        );
+        for (let x = minX; x <= maxX; x++) {
+            for (let z = minZ; z <= maxZ; z++) {
+                const cell = this.cells.get(`${x},${z}`);
+                if (!cell) continue;
+                cell.forEach((entity) => {
+                    // entities dropped without entityGone, e.g. on respawn
+                    if (this.bot.entities[entity.id] !== entity) {
+                        this.remove(entity);
+                        return;
+                    }
+                    if (!filter(entity)) return;
+                    const distance = entity.position.distanceTo(point);
+                    if (distance < maxDistance) found.push([distance, entity]);
+                });
+            }
+        }
+        return found;
+    }
+
+    // Distance to the closest entity of each name within maxDistance
+    nearestByType(point, maxDistance, filter) {
+        const nearest = {};
+        const found = this.within(point, maxDistance, filter);
+        found.forEach(([distance, entity]) => {
+            if (!(entity.name in nearest) || distance < nearest[entity.name]) {
+                nearest[entity.name] = distance;
+            }
+        });
+        return nearest;
+    }
+
+    nearest(name, point, maxDistance) {
+        let best = null;
+        const found = this.within(
+            point,
+            maxDistance,
+            (entity) => entity.name === name
+        );
+        found.forEach(([distance, entity]) => {
+            if (!best || distance < best[0]) best = [distance, entity];
+        });
+        return best ? best[1] : null;
+    }
+
+    // Call back once the entity is gone, returns a function that stops
+    // watching it
+    onGone(entity, callback) {
+        if (!this.goneWatchers.has(entity.id)) {
+            this.goneWatchers.set(entity.id, new Set());
+        }
+        const watchers = this.goneWatchers.get(entity.id);
+        watchers.add(callback);
+        return () => {
+            watchers.delete(callback);
+            if (
+                watchers.size === 0 &&
+                this.goneWatchers.get(entity.id) === watchers
+            ) {
+                this.goneWatchers.delete(entity.id);
+            }
+        };
+    }
+}
+
+function inject(bot) {
+    bot.entityIndex = new EntityIndex(bot);
+}
+
+module.exports = { EntityIndex, inject };
@@ -0,0 +1,53 @@
+// Watches the task goal sent with a step and calls onReached once it is met.
+// Inventory goals count the matching items gained since the step started,
+// kill goals count matching mobs dying near the bot.
+class GoalMonitor {
+    constructor(bot, goal, onReached) {
+        this.bot = bot;
+        this.goal = goal;
+        this.pattern = new RegExp(goal.pattern);
+        this.onReached = onReached;
+        this.kills = 0;
+        this.baseline = this.countItems();
+        this.onSlot = () => this.check();
+        this.onDead = (entity) => {
+            if (!entity.name || !this.pattern.test(entity.name)) return;
+            if (entity.position.distanceTo(bot.entity.position) > 16) return;
+            this.kills++;
+            this.check();
+        };
+        if (goal.type === "kill") {
+            bot.on("entityDead", this.onDead);
+        } else {
+            bot.inventory.on("updateSlot", this.onSlot);
+        }
+    }
+
+    countItems() {
+        return this.bot.inventory
+            .items()
+            .filter((item) => this.pattern.test(item.name))
+            .reduce((total, item) => total + item.count, 0);
+    }
+
+    progress() {
+        if (this.goal.type === "kill") return this.kills;
+        return this.countItems() - this.baseline;
+    }
+
+    check() {
+        if (this.onReached && this.progress() >= this.goal.count) {
+            const onReached = this.onReached;
+            this.stop();
+            onReached();
+        }
+    }
+
+    stop() {
+        this.onReached = null;
+        this.bot.removeListener("entityDead", this.onDead);
+        this.bot.inventory.removeListener("updateSlot", this.onSlot);
+    }
+}
+
+module.exports = { GoalMonitor };
@@ -8,38 +8,98 @@ class Observation {
 
         this.bot = bot;
         this.name = "Observation";
+        // optional observers only run when a request lists them
+        this.optional = false;
     }
 
     observe() {
         throw new TypeError("Method 'observe()' must be implemented.");
     }
 
+    // Cheap view recorded for intermediate events, the full observation is
+    // only computed for the final observe event. Return undefined to leave
+    // the observer out of intermediate events.
+    snapshot() {
+        return this.observe();
+    }
+
     reset() {}
 }
 
+const DEFAULT_OPTIONS = {
+    voxelRadius: [8, 2, 8],
+    entityRadius: 32,
+    chestRadius: 16,
+};
+
+// Observers and radii asked for by a request. Radii the request leaves out
+// fall back to defaults, without a list of observers all of them run. The
+// on* observers always report their events.
+function configure(bot, body, defaults = DEFAULT_OPTIONS) {
+    bot.observeOptions = { ...defaults };
+    for (const key in defaults) {
+        if (body[key] !== undefined && body[key] !== null) {
+            bot.observeOptions[key] = body[key];
+        }
+    }
+    bot.obsFilter = body.observers ? new Set(body.observers) : null;
+    return bot.observeOptions;
+}
+
 function inject(bot, obs_list) {
     bot.obsList = [];
     bot.cumulativeObs = [];
     bot.eventMemory = {};
+    bot.observeOptions = { ...DEFAULT_OPTIONS };
+    bot.obsFilter = null;
+    // set while a step streams its events, receives every finished event
+    bot.eventSink = null;
     obs_list.forEach((obs) => {
         bot.obsList.push(new obs(bot));
     });
     bot.event = function (event_name) {
         let result = {};
         bot.obsList.forEach((obs) => {
-            if (obs.name.startsWith("on") && obs.name !== event_name) {
+            if (obs.name.startsWith("on")) {
+                if (obs.name === event_name) result[obs.name] = obs.observe();
+            } else if (
+                bot.obsFilter ? !bot.obsFilter.has(obs.name) : obs.optional
+            ) {
                 return;
+            } else if (event_name === "observe") {
+                result[obs.name] = obs.observe();
+            } else {
+                const snapshot = obs.snapshot();
+                if (snapshot !== undefined) result[obs.name] = snapshot;
             }
-            result[obs.name] = obs.observe();
         });
+        // coalesce an event repeating the previous one, e.g. the same chat
+        // message sent in a loop. The merged entry carries the newest
+        // snapshot, the state may have changed between the repeats.
+        const last = bot.cumulativeObs[bot.cumulativeObs.length - 1];
+        if (
+            event_name !== "observe" &&
+            last &&
+            last[0] === event_name &&
+            last[1][event_name] === result[event_name]
+        ) {
+            result.repeat = (last[1].repeat || 1) + 1;
+            last[1] = result;
+            return;
+        }
         bot.cumulativeObs.push([event_name, result]);
+        // the newest event is held back as it may still repeat
+        if (bot.eventSink && bot.cumulativeObs.length > 1) {
+            const finished = bot.cumulativeObs.length - 1;
+            bot.eventSink(bot.cumulativeObs.splice(0, finished));
+        }
     };
     bot.observe = function () {
         bot.event("observe");
         const result = bot.cumulativeObs;
         bot.cumulativeObs = [];
-        return JSON.stringify(result);
+        return result;
     };
 }
 
-module.exports = { Observation, inject };
+module.exports = { Observation, inject, configure };
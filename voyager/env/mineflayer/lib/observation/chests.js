@@ -16,7 +16,7 @@ class Chests extends Observation {
     observe() {
         const chests = this.bot.findBlocks({
             matching: this.bot.registry.blocksByName.chest.id,
-            maxDistance: 16,
+            maxDistance: this.bot.observeOptions.chestRadius,
             count: 999,
         });
         chests.forEach((chest) => {
@@ -26,6 +26,14 @@ class Chests extends Observation {
         });
         return this.chestsItems;
     }
+
+    snapshot() {
+        return undefined;
+    }
+
+    reset() {
+        this.chestsItems = {};
+    }
 }
 
 module.exports = Chests;
@@ -7,6 +7,15 @@ class Status extends Observation {
     }
 
     observe() {
+        return {
+            ...this.snapshot(),
+            entities: this.getEntities(),
+        };
+    }
+
+    // everything but the entity scan
+    snapshot() {
+        const block = this.bot.blockAt(this.bot.entity.position);
         return {
             health: this.bot.health,
             food: this.bot.food,
@@ -25,10 +34,7 @@ class Status extends Observation {
             isInWeb: this.bot.entity.isInWeb,
             isCollidedHorizontally: this.bot.entity.isCollidedHorizontally,
             isCollidedVertically: this.bot.entity.isCollidedVertically,
-            biome: this.bot.blockAt(this.bot.entity.position)
-                ? this.bot.blockAt(this.bot.entity.position).biome.name
-                : "None",
-            entities: this.getEntities(),
+            biome: block ? block.biome.name : "None",
             timeOfDay: this.getTime(),
             inventoryUsed: this.bot.inventoryUsed(),
             elapsedTime: this.bot.globalTickCounter,
@@ -72,31 +78,17 @@ class Status extends Observation {
             .map(this.itemToObs);
     }
 
+    // distance to the nearest mob of each kind, players and items left out
     getEntities() {
-        const entities = this.bot.entities;
-        if (!entities) return {};
-        // keep all monsters in one list, keep other mobs in another list
-        const mobs = {};
-        for (const id in entities) {
-            const entity = entities[id];
-            if (!entity.displayName) continue;
-            if (entity.name === "player" || entity.name === "item") continue;
-            if (entity.position.distanceTo(this.bot.entity.position) < 32) {
-                if (!mobs[entity.name]) {
-                    mobs[entity.name] = entity.position.distanceTo(
-                        this.bot.entity.position
-                    );
-                } else if (
-                    mobs[entity.name] >
-                    entity.position.distanceTo(this.bot.entity.position)
-                ) {
-                    mobs[entity.name] = entity.position.distanceTo(
-                        this.bot.entity.position
-                    );
-                }
-            }
-        }
-        return mobs;
+        if (!this.bot.entityIndex) return {};
+        return this.bot.entityIndex.nearestByType(
+            this.bot.entity.position,
+            this.bot.observeOptions.entityRadius,
+            (entity) =>
+                entity.displayName &&
+                entity.name !== "player" &&
+                entity.name !== "item"
+        );
     }
 }
 
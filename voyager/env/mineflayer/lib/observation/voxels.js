@@ -1,5 +1,6 @@
 // Blocks = require("./blocks")
 const { Observation } = require("./base");
+const { getVoxelIndex } = require("../voxelIndex");
 
 class Voxels extends Observation {
     constructor(bot) {
@@ -8,7 +9,36 @@ class Voxels extends Observation {
     }
 
     observe() {
-        return Array.from(getSurroundingBlocks(this.bot, 8, 2, 8));
+        return getVoxelIndex(this.bot).names();
+    }
+
+    snapshot() {
+        return undefined;
+    }
+}
+
+// Block state ids of the voxel box as little endian uint16 in base64, only
+// observed when a request asks for it by name
+class VoxelGrid extends Observation {
+    constructor(bot) {
+        super(bot);
+        this.name = "voxelGrid";
+        this.optional = true;
+    }
+
+    observe() {
+        const { origin, shape, ids, palette } = getVoxelIndex(this.bot).grid();
+        return {
+            origin,
+            shape,
+            dtype: "<u2",
+            data: Buffer.from(ids.buffer).toString("base64"),
+            palette,
+        };
+    }
+
+    snapshot() {
+        return undefined;
     }
 }
 
@@ -22,7 +52,7 @@ class BlockRecords extends Observation {
             this.tick++;
             if (this.tick >= 100) {
                 const items = getInventoryItems(this.bot);
-                getSurroundingBlocks(this.bot, 8, 2, 8).forEach((block) => {
+                getVoxelIndex(this.bot).names().forEach((block) => {
                     if (!items.has(block)) this.records.add(block);
                 });
                 this.tick = 0;
@@ -34,26 +64,13 @@ class BlockRecords extends Observation {
         return Array.from(this.records);
     }
 
-    reset() {
-        this.records = new Set();
+    snapshot() {
+        return undefined;
     }
-}
 
-function getSurroundingBlocks(bot, x_distance, y_distance, z_distance) {
-    const surroundingBlocks = new Set();
-
-    for (let x = -x_distance; x <= x_distance; x++) {
-        for (let y = -y_distance; y <= y_distance; y++) {
-            for (let z = -z_distance; z <= z_distance; z++) {
-                const block = bot.blockAt(bot.entity.position.offset(x, y, z));
-                if (block && block.type !== 0) {
-                    surroundingBlocks.add(block.name);
-                }
-            }
-        }
+    reset() {
+        this.records = new Set();
     }
-    // console.log(surroundingBlocks);
-    return surroundingBlocks;
 }
 
 function getInventoryItems(bot) {
@@ -64,4 +81,4 @@ function getInventoryItems(bot) {
     return items;
 }
 
-module.exports = { Voxels, BlockRecords };
+module.exports = { Voxels, VoxelGrid, BlockRecords };
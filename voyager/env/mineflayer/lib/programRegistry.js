@@ -0,0 +1,68 @@
+const crypto = require("crypto");
+const vm = require("vm");
+
+// top level function declarations, control primitives and babel generated
+// skills always start them at column 0
+const FUNCTION_PATTERN = /^(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)/gm;
+
+class ProgramRegistry {
+    constructor() {
+        this.programs = new Map();
+        this.filenames = new Map();
+    }
+
+    hash(source) {
+        return crypto.createHash("sha256").update(source).digest("hex");
+    }
+
+    has(hash) {
+        return this.programs.has(hash);
+    }
+
+    missing(hashes) {
+        return hashes.filter((hash) => !this.programs.has(hash));
+    }
+
+    // Compile a program once and keep it under its content hash.
+    // The program is wrapped in a factory so every step can bind it to a
+    // fresh scope (bot, mcData, goals, fail counters...) without reparsing.
+    register(source) {
+        const hash = this.hash(source);
+        if (this.programs.has(hash)) return hash;
+        const names = Array.from(source.matchAll(FUNCTION_PATTERN), (m) => m[1]);
+        const filename = `${names[0] || "program"}.${hash.slice(0, 8)}.js`;
+        const wrapped =
+            "(function (__scope) { with (__scope) { return (function () {\n" +
+            source +
+            `\nreturn { ${names.join(", ")} };\n})(); } })`;
+        const script = new vm.Script(wrapped, { filename, lineOffset: -1 });
+        this.programs.set(hash, {
+            source,
+            names,
+            filename,
+            factory: script.runInThisContext(),
+        });
+        this.filenames.set(filename, hash);
+        return hash;
+    }
+
+    // Instantiate the programs in order into scope, later programs override
+    // earlier ones with the same function name like in a concatenated bundle.
+    link(hashes, scope) {
+        for (const hash of hashes) {
+            Object.assign(scope, this.programs.get(hash).factory(scope));
+        }
+        return scope;
+    }
+
+    // Map a stack frame back to the source line of a registered program
+    sourceLine(filename, line) {
+        const hash = this.filenames.get(filename);
+        if (!hash) return null;
+        const lines = this.programs.get(hash).source.split("\n");
+        if (line < 1 || line > lines.length) return null;
+        return lines[line - 1].trim();
+    }
+}
+
+module.exports = { ProgramRegistry };
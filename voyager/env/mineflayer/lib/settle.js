@@ -0,0 +1,43 @@
+let barrierCount = 0;
+
+function isStill(bot) {
+    const { velocity, onGround, isInWater } = bot.entity;
+    return (
+        (onGround || isInWater) &&
+        Math.abs(velocity.x) < 1e-3 &&
+        Math.abs(velocity.z) < 1e-3
+    );
+}
+
+// Wait until the bot stands still and, with barrier, until the server has
+// run every command sent so far: a tellraw to the bot is sent last and the
+// server echoes it after the effects of the earlier commands. maxTicks bounds
+// the wait, resolves with the number of ticks actually waited.
+function settle(bot, maxTicks, { barrier = false } = {}) {
+    if (!(maxTicks > 0)) return Promise.resolve(0);
+    return new Promise((resolve) => {
+        const token = `voyager-barrier-${process.pid}-${++barrierCount}`;
+        let acknowledged = !barrier;
+        let ticks = 0;
+        let stillTicks = 0;
+        const onMessage = (message) => {
+            if (message === token) acknowledged = true;
+        };
+        const onTick = () => {
+            ticks++;
+            stillTicks = isStill(bot) ? stillTicks + 1 : 0;
+            if ((acknowledged && stillTicks >= 2) || ticks >= maxTicks) {
+                bot.removeListener("physicTick", onTick);
+                bot.removeListener("messagestr", onMessage);
+                resolve(ticks);
+            }
+        };
+        if (barrier) {
+            bot.on("messagestr", onMessage);
+            bot.chat(`/tellraw @s ${JSON.stringify({ text: token })}`);
+        }
+        bot.on("physicTick", onTick);
+    });
+}
+
+module.exports = { settle };
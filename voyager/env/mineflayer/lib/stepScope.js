@@ -0,0 +1,149 @@
+const { AsyncResource } = require("async_hooks");
+
+const LISTENER_METHODS = [
+    "on",
+    "addListener",
+    "once",
+    "prependListener",
+    "prependOnceListener",
+];
+const REMOVE_METHODS = ["off", "removeListener"];
+
+// The timers, bot listeners and entity watchers a step's programs leave
+// behind. Programs see the bot and the timer functions through the scope,
+// so everything they register is known and cleared once the step ends,
+// instead of firing into a later step or after the reply was sent. A
+// program still running after that throws at its next bot access, also
+// when it catches the errors of the actions stopped under it.
+class StepScope {
+    constructor(bot, onError) {
+        this.realBot = bot;
+        this.onError = onError;
+        this.disposed = false;
+        this.reason = null;
+        this.timeouts = new Set();
+        this.intervals = new Set();
+        // [event, listener registered on the bot]
+        this.listeners = [];
+        // program listener -> listener registered on the bot
+        this.wrapped = new Map();
+        this.unwatchers = new Set();
+        this.bot = new Proxy(bot, {
+            get: (target, property) => {
+                if (this.disposed) throw new Error(this.reason);
+                if (LISTENER_METHODS.includes(property)) {
+                    return (event, listener) => {
+                        this.listen(property, event, listener);
+                        return this.bot;
+                    };
+                }
+                if (REMOVE_METHODS.includes(property)) {
+                    return (event, listener) => {
+                        this.unlisten(event, listener);
+                        return this.bot;
+                    };
+                }
+                if (property === "entityIndex" && target.entityIndex) {
+                    return this.entityIndex(target.entityIndex);
+                }
+                return Reflect.get(target, property, target);
+            },
+        });
+    }
+
+    // every program callback is registered through here. It runs in the
+    // async context it was registered in and its errors go to onError: a
+    // listener error would otherwise surface in whatever code emitted the
+    // event, possibly another bot's step.
+    wrap(callback) {
+        const onError = this.onError;
+        return AsyncResource.bind(function (...args) {
+            try {
+                return callback.apply(this, args);
+            } catch (err) {
+                onError(err);
+            }
+        });
+    }
+
+    listen(method, event, listener) {
+        if (this.disposed) return;
+        const wrapped = this.wrap(listener);
+        this.wrapped.set(listener, wrapped);
+        this.listeners.push([event, wrapped]);
+        this.realBot[method](event, wrapped);
+    }
+
+    unlisten(event, listener) {
+        const wrapped = this.wrapped.get(listener) || listener;
+        this.wrapped.delete(listener);
+        this.listeners = this.listeners.filter(
+            ([e, l]) => !(e === event && l === wrapped)
+        );
+        this.realBot.removeListener(event, wrapped);
+    }
+
+    entityIndex(index) {
+        const scoped = Object.create(index);
+        scoped.onGone = (entity, callback) => {
+            if (this.disposed) return () => {};
+            const unwatch = index.onGone(entity, this.wrap(callback));
+            this.unwatchers.add(unwatch);
+            return () => {
+                this.unwatchers.delete(unwatch);
+                unwatch();
+            };
+        };
+        return scoped;
+    }
+
+    // setTimeout and friends for the programs, timers set after the step
+    // ended never fire
+    globals() {
+        return {
+            setTimeout: (callback, ms, ...args) => {
+                if (this.disposed) return null;
+                const callbackWrapped = this.wrap(callback);
+                const handle = setTimeout(() => {
+                    this.timeouts.delete(handle);
+                    callbackWrapped(...args);
+                }, ms);
+                this.timeouts.add(handle);
+                return handle;
+            },
+            setInterval: (callback, ms, ...args) => {
+                if (this.disposed) return null;
+                const handle = setInterval(this.wrap(callback), ms, ...args);
+                this.intervals.add(handle);
+                return handle;
+            },
+            clearTimeout: (handle) => {
+                this.timeouts.delete(handle);
+                clearTimeout(handle);
+            },
+            clearInterval: (handle) => {
+                this.intervals.delete(handle);
+                clearInterval(handle);
+            },
+        };
+    }
+
+    dispose(reason = "Step ended") {
+        if (this.disposed) return;
+        this.disposed = true;
+        this.reason = reason;
+        this.timeouts.forEach((handle) => clearTimeout(handle));
+        this.intervals.forEach((handle) => clearInterval(handle));
+        this.timeouts.clear();
+        this.intervals.clear();
+        this.listeners.forEach(([event, listener]) =>
+            this.realBot.removeListener(event, listener)
+        );
+        this.listeners = [];
+        this.wrapped.clear();
+        this.unwatchers.forEach((unwatch) => unwatch());
+        this.unwatchers.clear();
+    }
+}
+
+module.exports = { StepScope };
@@ -1,28 +1,28 @@
-let gameTimeCounter = 0;
-let gameTimeList = [];
+// the time cycle is kept per bot since one process can host several bots
 const initCounter = (bot) => {
-    gameTimeList = [];
+    bot.gameTimeList = [];
     for (let i = 0; i < 13000; i += 1000) {
-        gameTimeList.push(i);
+        bot.gameTimeList.push(i);
     }
     for (let i = 13000; i < 24000; i += 2000) {
-        gameTimeList.push(i);
+        bot.gameTimeList.push(i);
     }
+    bot.gameTimeCounter = 0;
     const timeOfDay = bot.time.timeOfDay;
-    for (let i = 0; i < gameTimeList.length; i++) {
-        if (gameTimeList[i] > timeOfDay) {
-            gameTimeCounter = i - 1;
+    for (let i = 0; i < bot.gameTimeList.length; i++) {
+        if (bot.gameTimeList[i] > timeOfDay) {
+            bot.gameTimeCounter = i - 1;
             break;
         }
     }
 };
 
-const getNextTime = () => {
-    gameTimeCounter++;
-    if (gameTimeCounter >= gameTimeList.length) {
-        gameTimeCounter = 0;
+const getNextTime = (bot) => {
+    bot.gameTimeCounter++;
+    if (bot.gameTimeCounter >= bot.gameTimeList.length) {
+        bot.gameTimeCounter = 0;
     }
-    return gameTimeList[gameTimeCounter];
+    return bot.gameTimeList[bot.gameTimeCounter];
 };
 
 module.exports = {
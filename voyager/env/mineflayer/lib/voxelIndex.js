@@ -0,0 +1,207 @@
+const { Vec3 } = require("vec3");
+
+const DEFAULT_RADIUS = [8, 2, 8];
+const AXES = ["x", "y", "z"];
+const UNLOADED = 0xffff;
+
+// Block counts for the box around the bot, kept up to date from blockUpdate
+// and chunk events. Cells live in a ring buffer indexed by world coordinates
+// modulo the box size, so moving the bot only rescans the slabs it enters.
+class VoxelIndex {
+    constructor(bot, radius = DEFAULT_RADIUS) {
+        this.bot = bot;
+        this.setRadius(radius);
+        bot.on("blockUpdate", (oldBlock, newBlock) => {
+            const block = newBlock || oldBlock;
+            if (!block || !this.contains(block.position)) return;
+            this.setCell(block.position, newBlock);
+        });
+        bot.on("chunkColumnLoad", (point) => this.markColumn(point));
+        bot.on("chunkColumnUnload", (point) => this.markColumn(point));
+    }
+
+    setRadius(radius) {
+        this.radius = new Vec3(radius[0], radius[1], radius[2]);
+        this.size = this.radius.scaled(2).offset(1, 1, 1);
+        // state id per cell, -1 when the block is not loaded
+        this.cells = new Int32Array(this.size.x * this.size.y * this.size.z);
+        this.cells.fill(-1);
+        this.counts = new Map();
+        this.center = null;
+        this.dirty = [];
+    }
+
+    markColumn(point) {
+        if (this.center) this.dirty.push(point);
+    }
+
+    contains(position) {
+        if (!this.center) return false;
+        return AXES.every(
+            (axis) =>
+                Math.abs(Math.floor(position[axis]) - this.center[axis]) <=
+                this.radius[axis]
+        );
+    }
+
+    cellIndex(position) {
+        const mod = (value, size) => ((value % size) + size) % size;
+        return (
+            mod(position.x, this.size.x) +
+            this.size.x *
+                (mod(position.y, this.size.y) +
+                    this.size.y * mod(position.z, this.size.z))
+        );
+    }
+
+    countKey(stateId) {
+        if (stateId < 0) return null;
+        const block = this.bot.registry.blocksByStateId[stateId];
+        if (!block || block.id === 0) return null;
+        return block.name;
+    }
+
+    setCell(position, block) {
+        const index = this.cellIndex(position);
+        const stateId = block ? block.stateId : -1;
+        const previous = this.cells[index];
+        if (previous === stateId) return;
+        this.cells[index] = stateId;
+        const oldKey = this.countKey(previous);
+        if (oldKey) {
+            const count = this.counts.get(oldKey) - 1;
+            if (count > 0) this.counts.set(oldKey, count);
+            else this.counts.delete(oldKey);
+        }
+        const newKey = this.countKey(stateId);
+        if (newKey) this.counts.set(newKey, (this.counts.get(newKey) || 0) + 1);
+    }
+
+    scan(min, max) {
+        const position = new Vec3(0, 0, 0);
+        for (let x = min.x; x <= max.x; x++) {
+            for (let y = min.y; y <= max.y; y++) {
+                for (let z = min.z; z <= max.z; z++) {
+                    position.set(x, y, z);
+                    this.setCell(position, this.bot.blockAt(position));
+                }
+            }
+        }
+    }
+
+    // Bring the index to the bot's current block position, rescanning only
+    // the entered slabs and the loaded or unloaded chunk columns in range
+    sync() {
+        const target = this.bot.entity.position.floored();
+        const moves = AXES.map((axis) =>
+            this.center ? Math.abs(target[axis] - this.center[axis]) : Infinity
+        );
+        const slideCost =
+            moves[0] * this.size.y * this.size.z +
+            moves[1] * this.size.x * this.size.z +
+            moves[2] * this.size.x * this.size.y;
+        if (!(slideCost < this.size.x * this.size.y * this.size.z)) {
+            this.center = target;
+            this.dirty = [];
+            this.scan(target.minus(this.radius), target.plus(this.radius));
+            return;
+        }
+        AXES.forEach((axis) => {
+            const delta = target[axis] - this.center[axis];
+            if (delta === 0) return;
+            const min = this.center.minus(this.radius);
+            const max = this.center.plus(this.radius);
+            if (delta > 0) {
+                min[axis] = max[axis] + 1;
+                max[axis] = max[axis] + delta;
+            } else {
+                max[axis] = min[axis] - 1;
+                min[axis] = min[axis] + delta;
+            }
+            this.center[axis] = target[axis];
+            this.scan(min, max);
+        });
+        const dirty = this.dirty;
+        this.dirty = [];
+        dirty.forEach((column) => {
+            const min = this.center.minus(this.radius);
+            const max = this.center.plus(this.radius);
+            min.x = Math.max(min.x, column.x);
+            max.x = Math.min(max.x, column.x + 15);
+            min.z = Math.max(min.z, column.z);
+            max.z = Math.min(max.z, column.z + 15);
+            if (min.x <= max.x && min.z <= max.z) this.scan(min, max);
+        });
+    }
+
+    names() {
+        this.sync();
+        return Array.from(this.counts.keys());
+    }
+
+    // The box as state ids ordered by x, then y, then z varying fastest,
+    // UNLOADED marks blocks that are not loaded. The palette names the state
+    // ids present.
+    grid() {
+        this.sync();
+        const min = this.center.minus(this.radius);
+        const ids = new Uint16Array(this.cells.length);
+        const palette = {};
+        const { blocksByStateId } = this.bot.registry;
+        const position = new Vec3(0, 0, 0);
+        let i = 0;
+        for (let x = min.x; x < min.x + this.size.x; x++) {
+            for (let y = min.y; y < min.y + this.size.y; y++) {
+                for (let z = min.z; z < min.z + this.size.z; z++) {
+                    position.set(x, y, z);
+                    const stateId = this.cells[this.cellIndex(position)];
+                    if (stateId < 0) {
+                        ids[i++] = UNLOADED;
+                        continue;
+                    }
+                    ids[i++] = stateId;
+                    if (!(stateId in palette)) {
+                        const block = blocksByStateId[stateId];
+                        palette[stateId] = block ? block.name : null;
+                    }
+                }
+            }
+        }
+        return {
+            origin: [min.x, min.y, min.z],
+            shape: [this.size.x, this.size.y, this.size.z],
+            ids,
+            palette,
+        };
+    }
+}
+
+// A radius of three non-negative integers, anything else a request sends
+// falls back to the default
+function voxelRadius(value) {
+    if (
+        Array.isArray(value) &&
+        value.length === 3 &&
+        value.every((r) => Number.isInteger(r) && r >= 0)
+    ) {
+        return value;
+    }
+    return DEFAULT_RADIUS;
+}
+
+function getVoxelIndex(bot) {
+    const radius = voxelRadius(
+        bot.observeOptions && bot.observeOptions.voxelRadius
+    );
+    if (!bot.voxelIndex) {
+        bot.voxelIndex = new VoxelIndex(bot, radius);
+    } else if (
+        !AXES.every((axis, i) => bot.voxelIndex.radius[axis] === radius[i])
+    ) {
+        // a request asked for another radius, rebuilt on the next sync
+        bot.voxelIndex.setRadius(radius);
+    }
+    return bot.voxelIndex;
+}
+
+module.exports = { VoxelIndex, getVoxelIndex };
@@ -0,0 +1,51 @@
+const zlib = require("zlib");
+
+// msgpack is optional, clients asking for it get json when it is missing
+let msgpack = null;
+try {
+    msgpack = require("@msgpack/msgpack");
+} catch (err) {
+    msgpack = null;
+}
+
+// Encode data exactly once in the format negotiated through the Accept and
+// Accept-Encoding headers of the request
+function send(req, res, data) {
+    let body;
+    if (
+        msgpack &&
+        req.accepts(["application/json", "application/msgpack"]) ===
+            "application/msgpack"
+    ) {
+        body = Buffer.from(msgpack.encode(data, { ignoreUndefined: true }));
+        res.type("application/msgpack");
+    } else {
+        body = Buffer.from(JSON.stringify(data));
+        res.type("application/json");
+    }
+    if (body.length > 1024 && req.acceptsEncodings("gzip") === "gzip") {
+        body = zlib.gzipSync(body, { level: zlib.constants.Z_BEST_SPEED });
+        res.set("Content-Encoding", "gzip");
+    }
+    res.send(body);
+}
+
+// Newline delimited json written as the events happen, the response is only
+// ended with the final events
+function openStream(res) {
+    res.status(200);
+    res.type("application/x-ndjson");
+    res.set("Cache-Control", "no-cache");
+    res.flushHeaders();
+    return {
+        write(events) {
+            events.forEach((event) => res.write(JSON.stringify(event) + "\n"));
+        },
+        end(events) {
+            this.write(events);
+            res.end();
+        },
+    };
+}
+
+module.exports = { send, openStream };
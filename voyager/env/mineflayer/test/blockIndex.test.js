@@ -0,0 +1,166 @@
+const assert = require("assert");
+const { EventEmitter } = require("events");
+const { Vec3 } = require("vec3");
+const { inject } = require("../lib/blockIndex");
+
+const AIR = 0;
+const STONE = 1;
+const CHEST = 54;
+const BLOCKS = {
+    0: { id: 0, name: "air", minStateId: 0, maxStateId: 0 },
+    1: { id: 1, name: "stone", minStateId: 1, maxStateId: 1 },
+    54: { id: 54, name: "chest", minStateId: 54, maxStateId: 56 },
+};
+
+// a column of two sections, blocks are keyed by column x, world y and
+// column z
+function fakeColumn(blocks, sections) {
+    const column = {
+        blocks: new Map(blocks),
+        reads: 0,
+        sections,
+        getBlockStateId: (point) => {
+            column.reads++;
+            return column.blocks.get(`${point.x},${point.y},${point.z}`) || 0;
+        },
+    };
+    return column;
+}
+
+// chests in two columns, the section palettes use the 1.18 layout
+function fakeBot() {
+    const bot = new EventEmitter();
+    bot.registry = { blocks: BLOCKS };
+    bot.game = { minY: 0 };
+    bot.entity = { position: new Vec3(0, 0, 0) };
+    const columns = new Map([
+        [
+            "0,0",
+            fakeColumn(
+                [
+                    ["3,2,3", CHEST],
+                    ["10,5,10", CHEST + 1],
+                ],
+                [{ data: { palette: [AIR, STONE, CHEST + 1, CHEST] } }, null]
+            ),
+        ],
+        [
+            "1,0",
+            fakeColumn(
+                [["0,20,0", CHEST]],
+                // a single value and a direct container
+                [{ data: { value: STONE } }, { data: {} }]
+            ),
+        ],
+    ]);
+    bot.world = {
+        columns,
+        getColumnAt: (point) => columns.get(`${point.x >> 4},${point.z >> 4}`),
+        getColumns: () =>
+            Array.from(columns.keys(), (key) => {
+                const [chunkX, chunkZ] = key.split(",");
+                return { chunkX, chunkZ };
+            }),
+    };
+    bot.fallbacks = [];
+    bot.findBlocks = (options) => {
+        bot.fallbacks.push(options);
+        return [];
+    };
+    bot.findBlock = (options) => {
+        bot.fallbacks.push(options);
+        return null;
+    };
+    bot.blockAt = (position) => ({ position });
+    inject(bot);
+    return bot;
+}
+
+function chests(bot, options = {}) {
+    return bot
+        .findBlocks({ matching: CHEST, maxDistance: 64, count: 10, ...options })
+        .map((position) => position.toString());
+}
+
+describe("BlockIndex", () => {
+    it("finds sparse blocks nearest first", () => {
+        const bot = fakeBot();
+        assert.deepStrictEqual(chests(bot), [
+            new Vec3(3, 2, 3).toString(),
+            new Vec3(10, 5, 10).toString(),
+            new Vec3(16, 20, 0).toString(),
+        ]);
+        assert.deepStrictEqual(chests(bot, { count: 1 }), [
+            new Vec3(3, 2, 3).toString(),
+        ]);
+        assert.deepStrictEqual(chests(bot, { maxDistance: 10 }), [
+            new Vec3(3, 2, 3).toString(),
+        ]);
+        const block = bot.findBlock({ matching: CHEST, maxDistance: 64 });
+        assert.strictEqual(block.position.toString(), "(3, 2, 3)");
+        assert.deepStrictEqual(bot.fallbacks, []);
+    });
+
+    it("skips sections whose palette lacks the block", () => {
+        const bot = fakeBot();
+        chests(bot);
+        const [near, far] = bot.world.columns.values();
+        // the palette section is scanned, the missing one is not
+        assert.strictEqual(near.reads, 16 * 16 * 16);
+        // the single value section is skipped, the direct one scanned
+        assert.strictEqual(far.reads, 16 * 16 * 16);
+    });
+
+    it("stops once count blocks are found", () => {
+        const bot = fakeBot();
+        const far = bot.world.columns.get("1,0");
+        for (let x = 0; x < 16; x++) {
+            for (let z = 0; z < 16; z++) far.blocks.set(`${x},30,${z}`, CHEST);
+        }
+        chests(bot);
+        let measured = 0;
+        const point = new Vec3(0, 0, 0);
+        point.distanceTo = (other) => {
+            measured++;
+            return Vec3.prototype.distanceTo.call(point, other);
+        };
+        const found = bot.findBlocks({
+            matching: CHEST,
+            point,
+            maxDistance: 64,
+            count: 2,
+        });
+        assert.strictEqual(found.length, 2);
+        // only the sections and the chests of the near section are measured
+        assert.ok(measured < 10, `${measured} distances measured`);
+    });
+
+    it("follows block updates and chunk loads", () => {
+        const bot = fakeBot();
+        chests(bot);
+        const position = new Vec3(1, 0, 1);
+        bot.emit("blockUpdate", null, { type: CHEST, position });
+        assert.strictEqual(chests(bot, { count: 1 })[0], "(1, 0, 1)");
+        bot.emit(
+            "blockUpdate",
+            { type: CHEST, position },
+            { type: AIR, position }
+        );
+        assert.strictEqual(chests(bot, { count: 1 })[0], "(3, 2, 3)");
+        bot.emit("chunkColumnUnload", new Vec3(0, 0, 0));
+        assert.deepStrictEqual(chests(bot), ["(16, 20, 0)"]);
+        bot.world.columns.get("0,0").blocks.set("1,1,1", CHEST);
+        bot.emit("chunkColumnLoad", new Vec3(0, 0, 0));
+        assert.strictEqual(chests(bot, { count: 1 })[0], "(1, 1, 1)");
+        assert.strictEqual(chests(bot).length, 4);
+    });
+
+    it("leaves other searches to mineflayer", () => {
+        const bot = fakeBot();
+        bot.findBlocks({ matching: STONE, maxDistance: 16 });
+        bot.findBlocks({ matching: (block) => block.type === CHEST });
+        bot.findBlocks({ matching: CHEST, useExtraInfo: true });
+        bot.findBlock({ matching: [CHEST, STONE] });
+        assert.strictEqual(bot.fallbacks.length, 4);
+    });
+});
@@ -0,0 +1,124 @@
+const assert = require("assert");
+const { DeltaEncoder } = require("../lib/delta");
+
+// the client side of the encoding, as in apply_delta of the python bridge
+function apply(previous, value) {
+    if (value === null || typeof value !== "object" || Array.isArray(value)) {
+        return value;
+    }
+    if (value.$same) return previous;
+    if (value.$set) {
+        const rebuilt = { ...previous, ...value.$set };
+        value.$del.forEach((key) => delete rebuilt[key]);
+        return rebuilt;
+    }
+    if (value.$add) {
+        const removed = new Set(value.$del.map((item) => JSON.stringify(item)));
+        return previous
+            .filter((item) => !removed.has(JSON.stringify(item)))
+            .concat(value.$add);
+    }
+    return value;
+}
+
+function decode(held, encoded) {
+    const { deltaSeq, deltaBase, ...values } = encoded;
+    const observation = {};
+    for (const key in values) {
+        observation[key] = apply(held[key], values[key]);
+    }
+    return observation;
+}
+
+const observations = [
+    {
+        inventory: { oak_log: 2 },
+        voxels: ["grass_block", "dirt"],
+        status: { health: 20, position: { x: 0, y: 64, z: 0 } },
+    },
+    {
+        inventory: { oak_log: 1, oak_planks: 4 },
+        voxels: ["grass_block", "dirt"],
+        status: { health: 18, position: { x: 3, y: 64, z: 0 } },
+    },
+    {
+        inventory: {},
+        voxels: ["dirt", "stone", "coal_ore"],
+        status: { health: 18, position: { x: 3, y: 64, z: 0 } },
+    },
+    {
+        inventory: { stick: 4 },
+        voxels: ["stone", "stone"],
+        status: null,
+    },
+];
+
+describe("DeltaEncoder", () => {
+    it("sends the first observation in full", () => {
+        const encoded = new DeltaEncoder().encode(observations[0], null);
+        assert.deepStrictEqual(decode({}, encoded), observations[0]);
+        assert.strictEqual(encoded.deltaBase, undefined);
+        assert.ok(encoded.deltaSeq);
+    });
+
+    it("round-trips a sequence of observations", () => {
+        const encoder = new DeltaEncoder();
+        let held = {};
+        let seq = null;
+        observations.forEach((observation) => {
+            const encoded = encoder.encode(observation, seq);
+            held = decode(held, encoded);
+            seq = encoded.deltaSeq;
+            assert.deepStrictEqual(
+                Object.keys(held).sort(),
+                Object.keys(observation).sort()
+            );
+            for (const key in observation) {
+                if (Array.isArray(observation[key])) {
+                    assert.deepStrictEqual(
+                        [...held[key]].sort(),
+                        [...observation[key]].sort()
+                    );
+                } else {
+                    assert.deepStrictEqual(held[key], observation[key]);
+                }
+            }
+        });
+    });
+
+    it("encodes unchanged and changed values as diffs", () => {
+        const encoder = new DeltaEncoder();
+        const first = encoder.encode(observations[0], null);
+        const second = encoder.encode(observations[1], first.deltaSeq);
+        assert.strictEqual(second.deltaBase, first.deltaSeq);
+        assert.deepStrictEqual(second.voxels, { $same: true });
+        assert.deepStrictEqual(second.inventory, {
+            $set: { oak_log: 1, oak_planks: 4 },
+            $del: [],
+        });
+        const third = encoder.encode(observations[2], second.deltaSeq);
+        assert.deepStrictEqual(third.inventory, {
+            $set: {},
+            $del: ["oak_log", "oak_planks"],
+        });
+        assert.deepStrictEqual(third.voxels, {
+            $add: ["stone", "coal_ore"],
+            $del: ["grass_block"],
+        });
+    });
+
+    it("sends lists with duplicates in full", () => {
+        const encoder = new DeltaEncoder();
+        const first = encoder.encode(observations[2], null);
+        const second = encoder.encode(observations[3], first.deltaSeq);
+        assert.deepStrictEqual(second.voxels, ["stone", "stone"]);
+    });
+
+    it("sends everything in full to a client on another base", () => {
+        const encoder = new DeltaEncoder();
+        const first = encoder.encode(observations[0], null);
+        const second = encoder.encode(observations[0], first.deltaSeq - 1);
+        assert.strictEqual(second.deltaBase, undefined);
+        assert.deepStrictEqual(decode({}, second), observations[0]);
+    });
+});
@@ -0,0 +1,89 @@
+const assert = require("assert");
+const { EventEmitter } = require("events");
+const { Vec3 } = require("vec3");
+const { EntityIndex } = require("../lib/entityIndex");
+
+function fakeBot(entities) {
+    const bot = new EventEmitter();
+    bot.entities = {};
+    entities.forEach((entity) => (bot.entities[entity.id] = entity));
+    return bot;
+}
+
+function entity(id, name, x, z) {
+    return { id, name, position: new Vec3(x, 64, z) };
+}
+
+function spawn(bot, entity) {
+    bot.entities[entity.id] = entity;
+    bot.emit("entitySpawn", entity);
+}
+
+describe("EntityIndex", () => {
+    it("moves entities between cells", () => {
+        const cow = entity(1, "cow", 2, 2);
+        const bot = fakeBot([cow]);
+        const index = new EntityIndex(bot);
+        assert.deepStrictEqual([...index.cells.get("0,0").keys()], [1]);
+        cow.position = new Vec3(20, 64, -3);
+        bot.emit("entityMoved", cow);
+        assert.strictEqual(index.cells.get("0,0").size, 0);
+        assert.deepStrictEqual([...index.cells.get("1,-1").keys()], [1]);
+        assert.strictEqual(index.keys.get(1), "1,-1");
+        const origin = new Vec3(0, 64, 0);
+        assert.strictEqual(index.nearest("cow", origin, 8), null);
+        assert.strictEqual(index.nearest("cow", origin, 32), cow);
+    });
+
+    it("finds the nearest entity across cell boundaries", () => {
+        const bot = fakeBot([]);
+        const index = new EntityIndex(bot);
+        // the far one shares the cell of the point, the near one does not
+        const far = entity(1, "zombie", 1, 1);
+        const near = entity(2, "zombie", 16.5, 15);
+        const other = entity(3, "cow", 15.5, 15.5);
+        [far, near, other].forEach((e) => spawn(bot, e));
+        const point = new Vec3(15, 64, 15);
+        assert.strictEqual(index.nearest("zombie", point, 32), near);
+        assert.strictEqual(index.nearest("zombie", point, 2), near);
+        assert.strictEqual(index.nearest("skeleton", point, 32), null);
+        assert.deepStrictEqual(index.nearestByType(new Vec3(-1, 64, -1), 30), {
+            zombie: far.position.distanceTo(new Vec3(-1, 64, -1)),
+            cow: other.position.distanceTo(new Vec3(-1, 64, -1)),
+        });
+    });
+
+    it("drops entities the bot no longer knows", () => {
+        const cow = entity(1, "cow", 2, 2);
+        const bot = fakeBot([cow]);
+        const index = new EntityIndex(bot);
+        delete bot.entities[1];
+        assert.strictEqual(index.nearest("cow", new Vec3(0, 64, 0), 8), null);
+        assert.strictEqual(index.keys.has(1), false);
+        assert.strictEqual(index.cells.has("0,0"), false);
+    });
+
+    it("calls back once an entity is gone", () => {
+        const cow = entity(1, "cow", 2, 2);
+        const pig = entity(2, "pig", 3, 3);
+        const bot = fakeBot([cow, pig]);
+        const index = new EntityIndex(bot);
+        const gone = [];
+        index.onGone(cow, (e) => gone.push(["first", e.id]));
+        index.onGone(cow, (e) => gone.push(["second", e.id]));
+        const stop = index.onGone(pig, (e) => gone.push(["pig", e.id]));
+        stop();
+        assert.strictEqual(index.goneWatchers.has(2), false);
+        bot.emit("entityGone", pig);
+        bot.emit("entityGone", cow);
+        assert.deepStrictEqual(gone, [
+            ["first", 1],
+            ["second", 1],
+        ]);
+        assert.strictEqual(index.goneWatchers.size, 0);
+        assert.strictEqual(index.keys.size, 0);
+        // the watchers ran once, a second entityGone has none to call
+        bot.emit("entityGone", cow);
+        assert.strictEqual(gone.length, 2);
+    });
+});
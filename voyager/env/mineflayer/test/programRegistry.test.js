@@ -0,0 +1,87 @@
+const assert = require("assert");
+const { ProgramRegistry } = require("../lib/programRegistry");
+
+const craft = `async function craftItem(bot, name) {
+    _craftItemFailCount++;
+    return bot.crafted.push(name);
+}`;
+
+describe("ProgramRegistry", () => {
+    it("keeps a program under its content hash", () => {
+        const registry = new ProgramRegistry();
+        const hash = registry.register(craft);
+        assert.strictEqual(hash, registry.hash(craft));
+        assert.strictEqual(registry.register(craft), hash);
+        assert.ok(registry.has(hash));
+        assert.deepStrictEqual(registry.missing([hash, "unknown"]), [
+            "unknown",
+        ]);
+    });
+
+    it("links programs into the scope", async () => {
+        const registry = new ProgramRegistry();
+        const hashes = [
+            registry.register(craft),
+            registry.register(
+                "async function craftSticks(bot) {\n" +
+                    '    return craftItem(bot, "stick");\n}'
+            ),
+        ];
+        const bot = { crafted: [] };
+        const scope = registry.link(hashes, { _craftItemFailCount: 0 });
+        await scope.craftSticks(bot);
+        assert.deepStrictEqual(bot.crafted, ["stick"]);
+    });
+
+    it("lets later programs override earlier ones", () => {
+        const registry = new ProgramRegistry();
+        const hashes = [
+            registry.register("function name() { return 1; }"),
+            registry.register("function name() { return 2; }"),
+        ];
+        assert.strictEqual(registry.link(hashes, {}).name(), 2);
+        assert.strictEqual(registry.link(hashes.reverse(), {}).name(), 1);
+    });
+
+    it("counts failures per scope", async () => {
+        const registry = new ProgramRegistry();
+        const hashes = [registry.register(craft)];
+        const bot = { crafted: [] };
+        const first = registry.link(hashes, { _craftItemFailCount: 0 });
+        const second = registry.link(hashes, { _craftItemFailCount: 0 });
+        await first.craftItem(bot, "stick");
+        await first.craftItem(bot, "torch");
+        await second.craftItem(bot, "chest");
+        assert.strictEqual(first._craftItemFailCount, 2);
+        assert.strictEqual(second._craftItemFailCount, 1);
+    });
+
+    it("maps stack frames back to program lines", () => {
+        const registry = new ProgramRegistry();
+        registry.register(craft);
+        const { filename } = Array.from(registry.programs.values())[0];
+        assert.match(filename, /^craftItem\.[0-9a-f]{8}\.js$/);
+        assert.strictEqual(
+            registry.sourceLine(filename, 2),
+            "_craftItemFailCount++;"
+        );
+        assert.strictEqual(registry.sourceLine(filename, 10), null);
+        assert.strictEqual(registry.sourceLine("other.js", 1), null);
+    });
+
+    it("reports errors at the program line", () => {
+        const registry = new ProgramRegistry();
+        const hash = registry.register(
+            "function fail() {\n    throw new Error('failed');\n}"
+        );
+        const { filename } = registry.programs.get(hash);
+        try {
+            registry.link([hash], {}).fail();
+            assert.fail("fail() did not throw");
+        } catch (err) {
+            const frame = err.stack.match(/\((.+):(\d+):\d+\)/);
+            assert.strictEqual(frame[1], filename);
+            assert.strictEqual(Number(frame[2]), 2);
+        }
+    });
+});
@@ -0,0 +1,86 @@
+const assert = require("assert");
+const { EventEmitter } = require("events");
+const { settle } = require("../lib/settle");
+
+// a bot that stands still from the given tick on, ticks are run by hand
+function fakeBot(stillFrom = 0) {
+    const bot = new EventEmitter();
+    bot.ticks = 0;
+    bot.sent = [];
+    bot.entity = {
+        onGround: true,
+        isInWater: false,
+        velocity: { x: 0, y: 0, z: 0 },
+    };
+    bot.chat = (message) => bot.sent.push(message);
+    bot.tick = () => {
+        const moving = bot.ticks++ < stillFrom;
+        bot.entity.velocity.x = moving ? 0.2 : 0;
+        bot.emit("physicTick");
+    };
+    return bot;
+}
+
+// tick until the settle resolves or maxTicks ticks have run
+async function run(bot, settling, maxTicks) {
+    let result = null;
+    settling.then((ticks) => (result = ticks));
+    for (let i = 0; i < maxTicks && result === null; i++) {
+        bot.tick();
+        await null;
+    }
+    await null;
+    return result;
+}
+
+describe("settle", () => {
+    it("waits for the bot to be still for two ticks", async () => {
+        const bot = fakeBot(3);
+        assert.strictEqual(await run(bot, settle(bot, 20), 20), 5);
+        assert.strictEqual(bot.listenerCount("physicTick"), 0);
+        assert.deepStrictEqual(bot.sent, []);
+    });
+
+    it("needs the bot on the ground or in water", async () => {
+        const bot = fakeBot();
+        bot.entity.onGround = false;
+        const settling = settle(bot, 20);
+        assert.strictEqual(await run(bot, settling, 3), null);
+        bot.entity.isInWater = true;
+        assert.strictEqual(await run(bot, settling, 20), 5);
+    });
+
+    it("waits for the server to echo the barrier", async () => {
+        const bot = fakeBot();
+        const settling = settle(bot, 20, { barrier: true });
+        assert.strictEqual(bot.sent.length, 1);
+        const token = JSON.parse(bot.sent[0].replace("/tellraw @s ", "")).text;
+        assert.strictEqual(await run(bot, settling, 4), null);
+        bot.emit("messagestr", "some other message");
+        assert.strictEqual(await run(bot, settling, 2), null);
+        bot.emit("messagestr", token);
+        assert.strictEqual(await run(bot, settling, 20), 7);
+        assert.strictEqual(bot.listenerCount("messagestr"), 0);
+        // every barrier has a token of its own
+        settle(bot, 1, { barrier: true });
+        assert.notStrictEqual(bot.sent[1], bot.sent[0]);
+        bot.tick();
+    });
+
+    it("gives up after maxTicks", async () => {
+        const bot = fakeBot(100);
+        assert.strictEqual(await run(bot, settle(bot, 10), 50), 10);
+        const barrier = fakeBot();
+        const settling = settle(barrier, 10, { barrier: true });
+        assert.strictEqual(await run(barrier, settling, 50), 10);
+        assert.strictEqual(barrier.listenerCount("physicTick"), 0);
+        assert.strictEqual(barrier.listenerCount("messagestr"), 0);
+    });
+
+    it("does not wait without ticks", async () => {
+        const bot = fakeBot();
+        assert.strictEqual(await settle(bot, 0), 0);
+        assert.strictEqual(await settle(bot, undefined, { barrier: true }), 0);
+        assert.deepStrictEqual(bot.sent, []);
+    });
+});
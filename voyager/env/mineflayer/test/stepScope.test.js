@@ -0,0 +1,103 @@
+const assert = require("assert");
+const { EventEmitter } = require("events");
+const { StepScope } = require("../lib/stepScope");
+
+function wait(ms) {
+    return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+describe("StepScope", () => {
+    it("clears timers and intervals on dispose", async () => {
+        const scope = new StepScope(new EventEmitter(), assert.fail);
+        const { setTimeout, setInterval } = scope.globals();
+        let fired = 0;
+        setTimeout(() => fired++, 5);
+        setInterval(() => fired++, 5);
+        scope.dispose();
+        await wait(20);
+        assert.strictEqual(fired, 0);
+        assert.strictEqual(setTimeout(() => fired++, 0), null);
+    });
+
+    it("removes the step's bot listeners on dispose", () => {
+        const bot = new EventEmitter();
+        bot.on("chat", () => {});
+        const scope = new StepScope(bot, assert.fail);
+        let heard = 0;
+        scope.bot.on("chat", () => heard++).once("chat", () => heard++);
+        bot.emit("chat");
+        scope.dispose();
+        bot.emit("chat");
+        assert.strictEqual(heard, 2);
+        assert.strictEqual(bot.listenerCount("chat"), 1);
+    });
+
+    it("lets programs remove their own listeners", () => {
+        const bot = new EventEmitter();
+        const scope = new StepScope(bot, assert.fail);
+        const listener = () => assert.fail("removed listener called");
+        scope.bot.on("chat", listener);
+        scope.bot.removeListener("chat", listener);
+        bot.emit("chat");
+        assert.strictEqual(bot.listenerCount("chat"), 0);
+    });
+
+    it("reports callback errors to the step", async () => {
+        const errors = [];
+        const bot = new EventEmitter();
+        const scope = new StepScope(bot, (err) => errors.push(err.message));
+        scope.bot.on("chat", () => {
+            throw new Error("listener");
+        });
+        scope.globals().setTimeout(() => {
+            throw new Error("timer");
+        }, 0);
+        bot.emit("chat");
+        await wait(5);
+        assert.deepStrictEqual(errors, ["listener", "timer"]);
+    });
+
+    it("stops programs at their next bot access", async () => {
+        const bot = new EventEmitter();
+        let digs = 0;
+        bot.dig = async () => digs++;
+        const scope = new StepScope(bot, assert.fail);
+        const errors = [];
+        let running = true;
+        // a generated loop swallowing the errors of stopped actions
+        const program = (async () => {
+            while (running) {
+                try {
+                    await scope.bot.dig();
+                } catch (err) {
+                    errors.push(err.message);
+                }
+                await wait(1);
+            }
+        })();
+        await wait(10);
+        scope.dispose("Code was cancelled");
+        const dug = digs;
+        await wait(10);
+        running = false;
+        await program;
+        assert.ok(dug > 0);
+        assert.strictEqual(digs, dug);
+        assert.ok(errors.length > 0);
+        assert.ok(errors.every((message) => message === "Code was cancelled"));
+    });
+
+    it("unwatches entities on dispose", () => {
+        const unwatched = [];
+        const bot = new EventEmitter();
+        bot.entityIndex = {
+            onGone: (entity) => () => unwatched.push(entity),
+        };
+        const scope = new StepScope(bot, assert.fail);
+        scope.bot.entityIndex.onGone("zombie", () => {});
+        const stop = scope.bot.entityIndex.onGone("pig", () => {});
+        stop();
+        scope.dispose();
+        assert.deepStrictEqual(unwatched, ["pig", "zombie"]);
+    });
+});
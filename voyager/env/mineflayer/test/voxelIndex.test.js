@@ -0,0 +1,75 @@
+const assert = require("assert");
+const { EventEmitter } = require("events");
+const { Vec3 } = require("vec3");
+const { getVoxelIndex } = require("../lib/voxelIndex");
+
+const BLOCKS = {
+    0: { id: 0, name: "air" },
+    1: { id: 1, name: "stone" },
+    10: { id: 10, name: "dirt" },
+};
+
+// stone below y = 64, dirt at y = 64 and air above, x = 5 and beyond is
+// not loaded
+function fakeBot(position, voxelRadius) {
+    const bot = new EventEmitter();
+    bot.registry = { blocksByStateId: BLOCKS };
+    bot.entity = { position };
+    bot.observeOptions = { voxelRadius };
+    bot.blockAt = (point) => {
+        if (point.x >= 5) return null;
+        const stateId = point.y < 64 ? 1 : point.y === 64 ? 10 : 0;
+        return { stateId, position: point };
+    };
+    return bot;
+}
+
+describe("VoxelIndex", () => {
+    it("encodes the box in x, y, z order", () => {
+        const bot = fakeBot(new Vec3(4.5, 64, 0.5), [1, 1, 1]);
+        const { origin, shape, ids, palette } = getVoxelIndex(bot).grid();
+        assert.deepStrictEqual(origin, [3, 63, -1]);
+        assert.deepStrictEqual(shape, [3, 3, 3]);
+        assert.strictEqual(ids.length, 27);
+        // x = 3, y = 63..65, z varying fastest
+        assert.deepStrictEqual(
+            Array.from(ids.slice(0, 9)),
+            [1, 1, 1, 10, 10, 10, 0, 0, 0]
+        );
+        // x = 5 is not loaded
+        assert.deepStrictEqual(
+            Array.from(ids.slice(18)),
+            new Array(9).fill(0xffff)
+        );
+        assert.deepStrictEqual(palette, { 0: "air", 1: "stone", 10: "dirt" });
+    });
+
+    it("counts names without air", () => {
+        const bot = fakeBot(new Vec3(0, 64, 0), [1, 1, 1]);
+        assert.deepStrictEqual(getVoxelIndex(bot).names().sort(), [
+            "dirt",
+            "stone",
+        ]);
+    });
+
+    it("follows block updates and movement", () => {
+        const bot = fakeBot(new Vec3(0, 64, 0), [1, 1, 1]);
+        const index = getVoxelIndex(bot);
+        index.names();
+        const position = new Vec3(0, 65, 0);
+        bot.emit("blockUpdate", null, { stateId: 1, position });
+        assert.strictEqual(index.counts.get("stone"), 10);
+        bot.entity.position = new Vec3(0, 70, 0);
+        assert.deepStrictEqual(index.names(), []);
+    });
+
+    it("falls back to the default radius for malformed ones", () => {
+        [5, "8", [1, 2], [1, -1, 1], [1.5, 2, 1], null].forEach((radius) => {
+            const bot = fakeBot(new Vec3(0, 64, 0), radius);
+            const { shape } = getVoxelIndex(bot).grid();
+            assert.deepStrictEqual(shape, [17, 5, 17]);
+        });
+        const bot = fakeBot(new Vec3(0, 64, 0), [2, 0, 1]);
+        assert.deepStrictEqual(getVoxelIndex(bot).grid().shape, [5, 1, 3]);
+    });
+});
@@ -0,0 +1,108 @@
+const assert = require("assert");
+const http = require("http");
+const Module = require("module");
+const zlib = require("zlib");
+const express = require("express");
+
+const WIRE = require.resolve("../lib/wire");
+
+// wire.js loaded afresh, without @msgpack/msgpack when missing is set
+function loadWire(missing = false) {
+    delete require.cache[WIRE];
+    const load = Module._load;
+    if (missing) {
+        Module._load = function (request, ...args) {
+            if (request === "@msgpack/msgpack") {
+                throw new Error(`Cannot find module '${request}'`);
+            }
+            return load.call(this, request, ...args);
+        };
+    }
+    try {
+        return require(WIRE);
+    } finally {
+        Module._load = load;
+        delete require.cache[WIRE];
+    }
+}
+
+// serve data through wire.send and return the decoded reply to a request
+// with the headers the python bridge sends
+function roundTrip(wire, data, format, compress) {
+    const app = express();
+    app.get("/", (req, res) => wire.send(req, res, data));
+    const server = app.listen(0);
+    return new Promise((resolve, reject) => {
+        const request = http.get(
+            {
+                port: server.address().port,
+                headers: {
+                    Accept: `application/${format}`,
+                    "Accept-Encoding": compress ? "gzip" : "identity",
+                },
+            },
+            (res) => {
+                const chunks = [];
+                res.on("data", (chunk) => chunks.push(chunk));
+                res.on("end", () => {
+                    server.close();
+                    let body = Buffer.concat(chunks);
+                    const encoding = res.headers["content-encoding"];
+                    if (encoding === "gzip") body = zlib.gunzipSync(body);
+                    const type = res.headers["content-type"];
+                    resolve({
+                        type: type.split(";")[0],
+                        encoding,
+                        data: type.startsWith("application/msgpack")
+                            ? require("@msgpack/msgpack").decode(body)
+                            : JSON.parse(body),
+                    });
+                });
+            }
+        );
+        request.on("error", reject);
+    });
+}
+
+const EVENTS = [
+    ["onChat", { onChat: "hello", skipped: undefined }],
+    ["observe", { inventory: { oak_log: 3 }, voxels: "x".repeat(2048) }],
+];
+const DECODED = JSON.parse(JSON.stringify(EVENTS));
+
+describe("wire", () => {
+    it("sends json", async () => {
+        const reply = await roundTrip(loadWire(), EVENTS, "json", false);
+        assert.deepStrictEqual(reply, {
+            type: "application/json",
+            encoding: undefined,
+            data: DECODED,
+        });
+    });
+
+    it("sends msgpack", async () => {
+        const reply = await roundTrip(loadWire(), EVENTS, "msgpack", false);
+        assert.deepStrictEqual(reply, {
+            type: "application/msgpack",
+            encoding: undefined,
+            data: DECODED,
+        });
+    });
+
+    it("gzips large bodies for clients that accept it", async () => {
+        const wire = loadWire();
+        const reply = await roundTrip(wire, EVENTS, "msgpack", true);
+        assert.strictEqual(reply.encoding, "gzip");
+        assert.deepStrictEqual(reply.data, DECODED);
+        const small = await roundTrip(wire, EVENTS[0], "json", true);
+        assert.strictEqual(small.encoding, undefined);
+        assert.deepStrictEqual(small.data, DECODED[0]);
+    });
+
+    it("falls back to json without @msgpack/msgpack", async () => {
+        const reply = await roundTrip(loadWire(true), EVENTS, "msgpack", true);
+        assert.strictEqual(reply.type, "application/json");
+        assert.strictEqual(reply.encoding, "gzip");
+        assert.deepStrictEqual(reply.data, DECODED);
+    });
+});
@@ -3,7 +3,6 @@ import re
 import warnings
 from typing import List
 
-import psutil
 import subprocess
 import logging
 import threading
@@ -21,6 +20,8 @@ class SubprocessMonitor:
         callback_match: str = r"^(?!x)x$",  # regex that will never match
         callback: callable = None,
         finished_callback: callable = None,
+        ready_check: callable = None,
+        ready_interval: float = 0.1,
     ):
         self.commands = commands
         start_time = time.strftime("%Y%m%d_%H%M%S")
@@ -40,9 +41,15 @@ class SubprocessMonitor:
         self.callback_match = callback_match
         self.callback = callback
         self.finished_callback = finished_callback
+        # polled until it returns True, replaces ready_match when given
+        self.ready_check = ready_check
+        self.ready_interval = ready_interval
         self.thread = None
+        self.lock = threading.Lock()
 
     def _start(self):
+        import psutil
+
         self.logger.info(f"Starting subprocess with commands: {self.commands}")
 
         self.process = psutil.Popen(
@@ -54,7 +61,7 @@ class SubprocessMonitor:
         print(f"Subprocess {self.name} started with PID {self.process.pid}.")
         for line in iter(self.process.stdout.readline, ""):
             self.logger.info(line.strip())
-            if re.search(self.ready_match, line):
+            if self.ready_check is None and re.search(self.ready_match, line):
                 self.ready_line = line
                 self.logger.info("Subprocess is ready.")
                 self.ready_event.set()
@@ -67,11 +74,23 @@ class SubprocessMonitor:
             self.finished_callback()
 
     def run(self):
-        self.ready_event = threading.Event()
-        self.ready_line = None
-        self.thread = threading.Thread(target=self._start)
-        self.thread.start()
-        self.ready_event.wait()
+        # the process can be shared between threads, only one of them starts it
+        with self.lock:
+            if self.is_running:
+                return
+            self.ready_event = threading.Event()
+            self.ready_line = None
+            # ready checks must not mistake the exited process for the new one
+            self.process = None
+            self.thread = threading.Thread(target=self._start)
+            self.thread.start()
+            while self.ready_check and not self.ready_event.is_set():
+                if self.ready_check():
+                    self.logger.info("Subprocess is ready.")
+                    self.ready_event.set()
+                else:
+                    time.sleep(self.ready_interval)
+            self.ready_event.wait()
 
     def stop(self):
         self.logger.info("Stopping subprocess.")
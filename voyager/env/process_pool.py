@@ -0,0 +1,72 @@
+import queue
+import threading
+import time
+import warnings
+from typing import Callable, List
+
+from .process_monitor import SubprocessMonitor
+
+
+class ProcessPool:
+    """
+    Standby processes started ahead of time on spare ports. acquire() hands
+    out a ready process at once and release() warms a replacement on the
+    port given back, so the set of ports in use never changes. When every
+    standby is taken or still warming up, acquire() gives up after a timeout
+    and the caller starts a process cold.
+    """
+
+    def __init__(
+        self,
+        make_process: Callable[[int], SubprocessMonitor],
+        ports: List[int],
+        max_retries: int = 3,
+    ):
+        self.make_process = make_process
+        self.max_retries = max_retries
+        self.standby = queue.Queue()
+        self.closed = False
+        for port in ports:
+            self.release(port)
+
+    def _warm_up(self, port):
+        for _ in range(self.max_retries):
+            if self.closed:
+                return
+            process = self.make_process(port)
+            process.run()
+            if self.closed:
+                process.stop()
+                return
+            if process.is_running:
+                self.standby.put((port, process))
+                return
+        warnings.warn(f"Standby process on port {port} failed to start.")
+
+    def release(self, port):
+        threading.Thread(target=self._warm_up, args=(port,), daemon=True).start()
+
+    def acquire(self, timeout=10):
+        """
+        A running standby process as (port, process), None when none becomes
+        ready within timeout seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                port, process = self.standby.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if process.is_running:
+                return port, process
+            # died while waiting, replace it
+            self.release(port)
+
+    def close(self):
+        self.closed = True
+        while not self.standby.empty():
+            _, process = self.standby.get_nowait()
+            process.stop()
@@ -0,0 +1,48 @@
+import base64
+from collections import Counter
+
+import numpy as np
+
+
+class VoxelGrid:
+    """
+    NumPy view of the voxelGrid observation: blocks[x, y, z] holds the block
+    state id at origin + (x, y, z), UNLOADED where the block is not loaded.
+    The palette names the state ids present.
+    """
+
+    UNLOADED = 0xFFFF
+
+    def __init__(self, observation):
+        self.origin = np.array(observation["origin"])
+        self.palette = {
+            int(state_id): name for state_id, name in observation["palette"].items()
+        }
+        self.blocks = np.frombuffer(
+            base64.b64decode(observation["data"]), dtype=observation["dtype"]
+        ).reshape(observation["shape"])
+
+    def counts(self):
+        """
+        Number of blocks per name, air and unloaded blocks left out like in
+        the voxels observation.
+        """
+        state_ids, counts = np.unique(self.blocks, return_counts=True)
+        names = Counter()
+        for state_id, count in zip(state_ids.tolist(), counts.tolist()):
+            name = self.palette.get(state_id)
+            if name and name != "air":
+                names[name] += count
+        return dict(names)
+
+    def names(self):
+        return list(self.counts())
+
+    def mask(self, name):
+        """
+        Boolean array of the blocks with this name.
+        """
+        state_ids = [
+            state_id for state_id, block in self.palette.items() if block == name
+        ]
+        return np.isin(self.blocks, state_ids)
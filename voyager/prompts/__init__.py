@@ -1,7 +1,59 @@
-import pkg_resources
+import os
+import threading
+from importlib import resources
+
 import voyager.utils as U
 
+PACKAGE_PATH = str(resources.files("voyager"))
+
+
+class PromptRegistry:
+    """
+    Process-wide cache of the prompt and primitive files. A file is read
+    once and again only after its mtime changes, values compiled from files
+    are rebuilt only when one of them changed.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # path -> (mtime, text)
+        self.texts = {}
+        # key -> (mtimes of its files, value)
+        self.compiled = {}
+
+    def load(self, path):
+        mtime = os.stat(path).st_mtime_ns
+        with self.lock:
+            cached = self.texts.get(path)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        text = U.load_text(path)
+        with self.lock:
+            self.texts[path] = (mtime, text)
+        return text
+
+    def compile(self, key, paths, build):
+        """
+        build(*texts) of the files, cached under key until one of them
+        changes.
+        """
+        mtimes = tuple(os.stat(path).st_mtime_ns for path in paths)
+        with self.lock:
+            cached = self.compiled.get(key)
+            if cached and cached[0] == mtimes:
+                return cached[1]
+        value = build(*[self.load(path) for path in paths])
+        with self.lock:
+            self.compiled[key] = (mtimes, value)
+        return value
+
+
+registry = PromptRegistry()
+
+
+def prompt_path(prompt):
+    return f"{PACKAGE_PATH}/prompts/{prompt}.txt"
+
 
 def load_prompt(prompt):
-    package_path = pkg_resources.resource_filename("voyager", "")
-    return U.load_text(f"{package_path}/prompts/{prompt}.txt")
+    return registry.load(prompt_path(prompt))
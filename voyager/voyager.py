@@ -3,6 +3,7 @@ import json
 import os
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict
 
 import voyager.utils as U
@@ -12,6 +13,8 @@ from .agents import ActionAgent
 from .agents import CriticAgent
 from .agents import CurriculumAgent
 from .agents import SkillManager
+from .agents import LLMCache
+from .agents.llm_cache import discard_response
 
 class Voyager:
     def __init__(
@@ -22,6 +25,13 @@ class Voyager:
         openai_api_key: str = None,
         env_wait_ticks: int = 20,
         env_request_timeout: int = 600,
+        env_wire_format: str = "json",
+        env_compress: bool = False,
+        env_standby_processes: int = 0,
+        env_mineflayer=None,
+        env_step_budget: float = None,
+        env_delta_observations: bool = False,
+        env_headless: bool = False,
         bot_username: str = "bot",
         max_iterations: int = 160,
         reset_placed_if_failed: bool = False,
@@ -34,6 +44,7 @@ class Voyager:
         curriculum_agent_temperature: float = 0,
         curriculum_agent_qa_model_name: str = "gpt-3.5-turbo",
         curriculum_agent_qa_temperature: float = 0,
+        curriculum_agent_qa_workers: int = 4,
         curriculum_agent_warm_up: Dict[str, int] = None,
         curriculum_agent_core_inventory_items: str = r".*_log|.*_planks|stick|crafting_table|furnace"
         r"|cobblestone|dirt|coal|.*_pickaxe|.*_sword|.*_axe",
@@ -45,10 +56,14 @@ class Voyager:
         skill_manager_temperature: float = 0,
         skill_manager_retrieval_top_k: int = 5,
         openai_api_request_timeout: int = 240,
+        llm_cache_path: str = None,
+        llm_cache_mode: str = "read_write",
+        llm_cache_max_mb: int = 256,
         ckpt_dir: str = "ckpt",
         skill_library_dir: str = None,
         resume: bool = False,
     ):
+        start_time = time.time()
         # Set up logging
         self.logger = logging.getLogger(f'Voyager_{bot_username}')
         self.logger.setLevel(logging.INFO)
@@ -67,83 +82,125 @@ class Voyager:
             server_port=server_port,
             request_timeout=env_request_timeout,
             bot_username=bot_username,
+            wire_format=env_wire_format,
+            compress=env_compress,
+            standby_processes=env_standby_processes,
+            mineflayer=env_mineflayer,
+            delta_observations=env_delta_observations,
+            headless=env_headless,
         )
         self.env_wait_ticks = env_wait_ticks
+        self.env_step_budget = env_step_budget
         self.reset_placed_if_failed = reset_placed_if_failed
         self.max_iterations = max_iterations
 
         # set openai api key
         os.environ["OPENAI_API_KEY"] = openai_api_key
 
-        # init agents with agent-specific directories
-        self.action_agent = ActionAgent(
-            model_name=action_agent_model_name,
-            temperature=action_agent_temperature,
-            request_timout=openai_api_request_timeout,
-            ckpt_dir=agent_ckpt_dir,
-            resume=resume,
-            chat_log=action_agent_show_chat_log,
-            execution_error=action_agent_show_execution_error,
-        )
-        self.action_agent_task_max_retries = action_agent_task_max_retries
-        self.curriculum_agent = CurriculumAgent(
-            model_name=curriculum_agent_model_name,
-            temperature=curriculum_agent_temperature,
-            qa_model_name=curriculum_agent_qa_model_name,
-            qa_temperature=curriculum_agent_qa_temperature,
-            request_timout=openai_api_request_timeout,
-            ckpt_dir=agent_ckpt_dir,
-            resume=resume,
-            mode=curriculum_agent_mode,
-            warm_up=curriculum_agent_warm_up,
-            core_inventory_items=curriculum_agent_core_inventory_items,
-        )
-        self.critic_agent = CriticAgent(
-            model_name=critic_agent_model_name,
-            temperature=critic_agent_temperature,
-            request_timout=openai_api_request_timeout,
-            mode=critic_agent_mode,
-        )
-        self.skill_manager = SkillManager(
-            model_name=skill_manager_model_name,
-            temperature=skill_manager_temperature,
-            retrieval_top_k=skill_manager_retrieval_top_k,
-            request_timout=openai_api_request_timeout,
-            ckpt_dir=agent_skill_library_dir if agent_skill_library_dir else agent_ckpt_dir,
-            resume=True if resume or skill_library_dir else False,
-        )
+        # mineflayer and the two vector stores start in parallel while the
+        # other agents are set up
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            env_started = executor.submit(self.env.start_process)
+            curriculum_agent = executor.submit(
+                CurriculumAgent,
+                model_name=curriculum_agent_model_name,
+                temperature=curriculum_agent_temperature,
+                qa_model_name=curriculum_agent_qa_model_name,
+                qa_temperature=curriculum_agent_qa_temperature,
+                qa_workers=curriculum_agent_qa_workers,
+                request_timout=openai_api_request_timeout,
+                ckpt_dir=agent_ckpt_dir,
+                resume=resume,
+                mode=curriculum_agent_mode,
+                warm_up=curriculum_agent_warm_up,
+                core_inventory_items=curriculum_agent_core_inventory_items,
+            )
+            skill_manager = executor.submit(
+                SkillManager,
+                model_name=skill_manager_model_name,
+                temperature=skill_manager_temperature,
+                retrieval_top_k=skill_manager_retrieval_top_k,
+                request_timout=openai_api_request_timeout,
+                ckpt_dir=agent_skill_library_dir if agent_skill_library_dir else agent_ckpt_dir,
+                resume=True if resume or skill_library_dir else False,
+            )
+            # init agents with agent-specific directories
+            self.action_agent = ActionAgent(
+                model_name=action_agent_model_name,
+                temperature=action_agent_temperature,
+                request_timout=openai_api_request_timeout,
+                ckpt_dir=agent_ckpt_dir,
+                resume=resume,
+                chat_log=action_agent_show_chat_log,
+                execution_error=action_agent_show_execution_error,
+            )
+            self.action_agent_task_max_retries = action_agent_task_max_retries
+            self.critic_agent = CriticAgent(
+                model_name=critic_agent_model_name,
+                temperature=critic_agent_temperature,
+                request_timout=openai_api_request_timeout,
+                mode=critic_agent_mode,
+            )
+            self.curriculum_agent = curriculum_agent.result()
+            self.skill_manager = skill_manager.result()
+            env_started.result()
+        # responses of all agents shared through one on-disk cache, opt-in
+        self.llm_cache = None
+        if llm_cache_path:
+            self.llm_cache = LLMCache(
+                llm_cache_path,
+                mode=llm_cache_mode,
+                max_bytes=llm_cache_max_mb * 1024 * 1024,
+            )
+            self.action_agent.llm = self.llm_cache.wrap(self.action_agent.llm, "action")
+            self.critic_agent.llm = self.llm_cache.wrap(self.critic_agent.llm, "critic")
+            self.curriculum_agent.llm = self.llm_cache.wrap(
+                self.curriculum_agent.llm, "curriculum"
+            )
+            self.curriculum_agent.qa_llm = self.llm_cache.wrap(
+                self.curriculum_agent.qa_llm, "curriculum_qa"
+            )
+            self.skill_manager.llm = self.llm_cache.wrap(self.skill_manager.llm, "skill")
         self.recorder = U.EventRecorder(ckpt_dir=agent_ckpt_dir, resume=resume)
         self.resume = resume
 
         # init variables for rollout
         self.action_agent_rollout_num_iter = -1
         self.task = None
+        self.task_goal = None
         self.context = ""
         self.messages = None
         self.conversations = []
         self.last_events = None
         
-        self.logger.info(f"Initialized Voyager agent with username {bot_username}")
+        self.logger.info(
+            f"Initialized Voyager agent with username {bot_username} "
+            f"in {time.time() - start_time:.1f}s"
+        )
 
     def reset(self, task, context="", reset_env=True):
         self.logger.info(f"Resetting agent for task: {task}")
         self.action_agent_rollout_num_iter = 0
         self.task = task
+        self.task_goal = self.curriculum_agent.get_task_goal(task)
         self.context = context
+        difficulty = (
+            "easy" if len(self.curriculum_agent.completed_tasks) > 15 else "peaceful"
+        )
         if reset_env:
-            self.env.reset(
+            events = self.env.reset(
                 options={
                     "mode": "soft",
                     "wait_ticks": self.env_wait_ticks,
+                    "time": "next",
+                    "difficulty": difficulty,
                 }
             )
-        difficulty = (
-            "easy" if len(self.curriculum_agent.completed_tasks) > 15 else "peaceful"
-        )
-        events = self.env.step(
-            "bot.chat(`/time set ${getNextTime()}`);\n"
-            + f"bot.chat('/difficulty {difficulty}');"
-        )
+        else:
+            events = self.env.step(
+                "bot.chat(`/time set ${getNextTime()}`);\n"
+                + f"bot.chat('/difficulty {difficulty}');"
+            )
         skills = self.skill_manager.retrieve_skills(query=self.context)
         self.logger.debug(f"Retrieved {len(skills)} skills for context")
         system_message = self.action_agent.render_system_message(skills=skills)
@@ -158,6 +215,8 @@ class Voyager:
     def close(self):
         self.logger.info("Closing agent")
         self.env.close()
+        if self.llm_cache:
+            self.llm_cache.close()
 
     def step(self):
         if self.action_agent_rollout_num_iter < 0:
@@ -175,9 +234,12 @@ class Voyager:
             code = parsed_result["program_code"] + "\n" + parsed_result["exec_code"]
             events = self.env.step(
                 code,
-                programs=self.skill_manager.programs,
+                programs=self.skill_manager.get_programs(code),
+                budget_s=self.env_step_budget,
+                goal=self.task_goal,
             )
             self.recorder.record(events, self.task)
+            self.logger.debug(f"Ticks waited: {events[-1][1].get('ticksWaited')}")
             self.action_agent.update_chest_memory(events[-1][1]["nearbyChests"])
             success, critique = self.critic_agent.check_task_success(
                 events=events,
@@ -197,9 +259,11 @@ class Voyager:
                         position = event["status"]["position"]
                         blocks.append(block)
                         positions.append(position)
+                give_back_code = f"await givePlacedItemBack(bot, {U.json_dumps(blocks)}, {U.json_dumps(positions)})"
                 new_events = self.env.step(
-                    f"await givePlacedItemBack(bot, {U.json_dumps(blocks)}, {U.json_dumps(positions)})",
-                    programs=self.skill_manager.programs,
+                    give_back_code,
+                    programs=self.skill_manager.get_programs(give_back_code),
+                    observers=["inventory", "voxels"],
                 )
                 events[-1][1]["inventory"] = new_events[-1][1]["inventory"]
                 events[-1][1]["voxels"] = new_events[-1][1]["voxels"]
@@ -217,12 +281,19 @@ class Voyager:
                 context=self.context,
                 critique=critique,
             )
-            self.last_events = copy.deepcopy(events)
+            # rebuilt delta observations are new containers that share only
+            # unchanged values, a shallow copy is enough for them
+            if self.env.delta_observations:
+                self.last_events = list(events)
+            else:
+                self.last_events = copy.deepcopy(events)
             self.messages = [system_message, human_message]
         else:
             assert isinstance(parsed_result, str)
             self.recorder.record([], self.task)
             self.logger.warning(f"Parsing error: {parsed_result}")
+            # the next iteration asks again with the same messages
+            discard_response(self.action_agent.llm, self.messages)
 
         assert len(self.messages) == 2
         self.action_agent_rollout_num_iter += 1
@@ -314,6 +385,12 @@ class Voyager:
             self.curriculum_agent.update_exploration_progress(info)
             self.logger.info(f"Completed tasks: {', '.join(self.curriculum_agent.completed_tasks)}")
             self.logger.info(f"Failed tasks: {', '.join(self.curriculum_agent.failed_tasks)}")
+            if self.llm_cache:
+                hit_rates = ", ".join(
+                    f"{name} {rate:.0%}"
+                    for name, rate in self.llm_cache.hit_rates().items()
+                )
+                self.logger.info(f"LLM cache hit rates: {hit_rates}")
 
         return {
             "completed_tasks": self.curriculum_agent.completed_tasks,